@@ -1,7 +1,6 @@
+import io
 import os
 import time
-from PIL import Image
-import streamlit as st
 import tempfile
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -9,6 +8,10 @@ from selenium.webdriver.edge.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from pdf_writer import write_pdf_from_image_files
+from workspace import get_workspace
+from prescan import progress_estimate, scan_html
+from downloads import get_download_server
 
 def wait_for_visible(driver, by, selector, timeout=5):
     try:
@@ -78,9 +81,7 @@ def create_pdf_from_images(image_folder="screenshots", output_path="output.pdf")
     ])
     if not images:
         return
-    first_image = Image.open(images[0]).convert("RGB")
-    rest_images = [Image.open(p).convert("RGB") for p in images[1:]]
-    first_image.save(output_path, save_all=True, append_images=rest_images, resolution=600)
+    write_pdf_from_image_files(images, output_path, resolution=600)
 
 def process_html_file(driver, url, output_dir, progress_callback=None, current_page=0):
     driver.get(url)
@@ -101,6 +102,9 @@ def process_html_file(driver, url, output_dir, progress_callback=None, current_p
     return total_pages
 
 def run_streamlit_ui():
+    # Imported here so the helpers above can be used without Streamlit installed
+    import streamlit as st
+
     st.set_page_config(page_title="HTML to PDF Converter", layout="centered")
     st.title("📄 HTML to PDF Screenshot Capturer")
     st.markdown("Convert your Quarto HTML files into high-resolution PDFs with tab support.")
@@ -115,15 +119,21 @@ def run_streamlit_ui():
         options.add_argument("--window-size=2560,1440")
         driver = webdriver.Edge(options=options)
 
+        workspace = get_workspace()
+        server = get_download_server()
+        host = st.context.headers.get("Host") if hasattr(st, "context") else None
+        results = []
         progress_bar = st.progress(0)
         completed_pages = 0
-        estimated_pages_per_file = 10
-        total_pages_all_files = estimated_pages_per_file * len(uploaded_files)
+        # Slide counts from a quick pass over the HTML, no browser needed
+        total_pages_all_files = sum(scan_html(io.BytesIO(f.getvalue())).slides for f in uploaded_files)
+        started = time.time()
 
         for uploaded_file in uploaded_files:
             filename_base = os.path.splitext(uploaded_file.name)[0]
-            output_dir = os.path.join("output", filename_base)
-            os.makedirs(output_dir, exist_ok=True)
+            # Fresh directory per upload: screenshots from an earlier run of the
+            # same file name must not end up in this PDF
+            output_dir = workspace.job_dir(filename_base)
 
             file_path = os.path.join(output_dir, uploaded_file.name)
             with open(file_path, "wb") as f:
@@ -133,26 +143,37 @@ def run_streamlit_ui():
             url = "file://" + os.path.abspath(file_path)
 
             def update_progress(current):
-                progress_bar.progress(min(current / total_pages_all_files, 1.0))
+                fraction, remaining = progress_estimate(None, time.time() - started, total_pages_all_files, current)
+                progress_bar.progress(fraction, text=f"{current}/{total_pages_all_files} slides, "
+                                                     f"~{int(remaining or 0)}s left")
 
             pages_processed = process_html_file(driver, url, output_dir, update_progress, completed_pages)
             completed_pages += pages_processed
 
             pdf_path = os.path.join(output_dir, "output.pdf")
             if os.path.exists(pdf_path):
-                with open(pdf_path, "rb") as pdf_file:
-                    st.download_button(
-                        label=f"⬇️ Download PDF for `{uploaded_file.name}`",
-                        data=pdf_file,
-                        file_name=f"{filename_base}.pdf",
-                        mime="application/pdf",
-                        key=f"download_{uploaded_file.name}",
-                        use_container_width=True
-                    )
+                label = f"⬇️ Download PDF for `{uploaded_file.name}`"
+                if server is not None:
+                    # Streamed from disk by the download server, not kept in the session
+                    st.markdown(f"[{label}]({server.file_url(pdf_path, f'{filename_base}.pdf', host=host)})")
+                    results.append((pdf_path, f"{filename_base}.pdf"))
+                else:
+                    with open(pdf_path, "rb") as pdf_file:
+                        st.download_button(
+                            label=label,
+                            data=pdf_file,
+                            file_name=f"{filename_base}.pdf",
+                            mime="application/pdf",
+                            key=f"download_{uploaded_file.name}",
+                            use_container_width=True
+                        )
+            workspace.finish(output_dir)
 
         driver.quit()
         progress_bar.empty()
         st.success(f"✅ All files processed! Total pages: {completed_pages}")
+        if len(results) > 1:
+            st.markdown(f"[📦 Download all {len(results)} PDFs as ZIP]({server.zip_url(results, 'quarto2pdf.zip', host=host)})")
 
 if __name__ == "__main__":
     run_streamlit_ui()
\ No newline at end of file
@@ -0,0 +1,431 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import threading
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from conversion_cache import _atomic_write, hash_file
+
+
+# Local copies of the CDN assets Quarto HTML pulls in (MathJax, Bootstrap,
+# Reveal.js plugins, fonts), so renders don't depend on, or wait for, the
+# network. Entries are stored by the SHA-256 of the URL (fragment removed):
+#
+#   <root>/<key>.body   the response body
+#   <root>/<key>.json   {"url", "content_type"}; written last, like the PDF cache
+#
+# render.js reads the same layout. QUARTO2PDF_ASSETS selects the behaviour:
+#   off      no interception
+#   cache    serve cached assets, fetch everything else from the network
+#   offline  serve cached assets and fail every other remote request at once
+# Misses are appended to <root>/misses.txt (each URL once, at most MAX_MISSES),
+# so a host with network access can fetch exactly what an offline render was
+# missing:
+#   python asset_cache.py seed --from-misses
+#
+# Seeding from documents:
+#   python asset_cache.py seed decks/ --url https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml-full.js
+
+ASSET_MODES = ("off", "cache", "offline")
+MISSES_FILE = "misses.txt"
+MAX_MISSES = 10000  # Distinct URLs kept in misses.txt
+
+_cache = None
+_server = None
+_lock = threading.Lock()
+
+
+def asset_settings():
+    mode = os.environ.get("QUARTO2PDF_ASSETS", "cache")
+    if mode not in ASSET_MODES:
+        raise ValueError(f"Unknown QUARTO2PDF_ASSETS '{mode}', expected one of: {', '.join(ASSET_MODES)}")
+    return os.environ.get("QUARTO2PDF_ASSET_DIR", "asset-cache"), mode
+
+
+def normalize_url(url):
+    return url.split("#", 1)[0]
+
+
+def url_key(url):
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+def is_remote(url):
+    return url.startswith(("http://", "https://"))
+
+
+class AssetCache:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._missed = None  # URLs already in misses.txt, loaded on first miss
+
+    def _paths(self, url):
+        key = url_key(url)
+        return (os.path.join(self.root, f"{key}.body"),
+                os.path.join(self.root, f"{key}.json"))
+
+    # (body path, metadata) or None
+    def get(self, url):
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        return body_path, meta
+
+    def put(self, url, data, content_type):
+        os.makedirs(self.root, exist_ok=True)
+        body_path, meta_path = self._paths(url)
+        meta = {"url": normalize_url(url), "content_type": content_type}
+        _atomic_write(body_path, lambda out: out.write(data))
+        _atomic_write(meta_path, lambda out: out.write(json.dumps(meta).encode("utf-8")))
+        return body_path
+
+    def record_miss(self, url):
+        url = normalize_url(url)
+        with self._lock:
+            if self._missed is None:
+                self._missed = set(self.misses())
+            if url in self._missed or len(self._missed) >= MAX_MISSES:
+                return
+            self._missed.add(url)
+            try:
+                os.makedirs(self.root, exist_ok=True)
+                with open(os.path.join(self.root, MISSES_FILE), "a", encoding="utf-8") as f:
+                    f.write(url + "\n")
+            except OSError:
+                pass
+
+    def misses(self):
+        try:
+            with open(os.path.join(self.root, MISSES_FILE), "r", encoding="utf-8") as f:
+                return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+        except OSError:
+            return []
+
+    def clear_misses(self):
+        with self._lock:
+            self._missed = None
+            try:
+                os.remove(os.path.join(self.root, MISSES_FILE))
+            except OSError:
+                pass
+
+
+def get_asset_cache():
+    global _cache
+    with _lock:
+        root = asset_settings()[0]
+        if _cache is None or _cache.root != root:
+            _cache = AssetCache(root)
+        return _cache
+
+
+# Remote references in HTML that the browser loads while rendering (not <a>
+# links): script/img/source/iframe src, link href, and url() in inline CSS
+_TAG_RE = re.compile(r"<(script|link|img|source|iframe)\b[^>]*>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""(\s(?:src|href)\s*=\s*["'])((?:https?:)?//)""", re.IGNORECASE)
+_CSS_URL_RE = re.compile(r"""(url\(\s*["']?|@import\s+["'])((?:https?:)?//)""", re.IGNORECASE)
+_STYLE_ELEMENT_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style\s*>)", re.IGNORECASE | re.DOTALL)
+_ANY_TAG_RE = re.compile(r"<[a-zA-Z][^>]*\bstyle\s*=[^>]*>", re.IGNORECASE)
+_STYLE_ATTR_RE = re.compile(r"""(\sstyle\s*=\s*)("[^"]*"|'[^']*')""", re.IGNORECASE)
+_INTEGRITY_RE = re.compile(r"""\s+integrity\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.IGNORECASE)
+
+
+# Serves the asset cache over plain HTTP on localhost for the Selenium method,
+# which cannot intercept requests itself. URLs map onto paths as
+#   https://cdn.example/npm/x.js -> http://127.0.0.1:PORT/https/cdn.example/npm/x.js
+# so relative references (MathJax components, fonts in CSS) resolve back into
+# the mirror too. Absolute URLs inside served CSS are rewritten the same way.
+class _MirrorHandler(BaseHTTPRequestHandler):
+    cache = None
+    mode = "cache"
+
+    def do_GET(self):
+        scheme, _, rest = self.path.lstrip("/").partition("/")
+        if scheme not in ("http", "https") or not rest:
+            self.send_error(404)
+            return
+        url = f"{scheme}://{rest}"
+        entry = self.cache.get(url)
+        if entry is None:
+            self.cache.record_miss(url)
+            if self.mode == "offline":
+                self.send_error(404, "Not in the asset cache")
+            else:
+                self.send_response(307)
+                self.send_header("Location", url)
+                self.send_header("Content-Length", "0")
+                # crossorigin scripts and fonts check CORS on the redirect too
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+            return
+
+        body_path, meta = entry
+        with open(body_path, "rb") as f:
+            data = f.read()
+        content_type = meta.get("content_type") or "application/octet-stream"
+        if content_type.startswith("text/css"):
+            data = self.server.rewrite_css(data.decode("utf-8", "replace")).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AssetServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cache, mode):
+        handler = type("MirrorHandler", (_MirrorHandler,), {"cache": cache, "mode": mode})
+        super().__init__(("127.0.0.1", 0), handler)
+        self.prefix = f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def mirror_url(self, scheme_slashes):
+        scheme = scheme_slashes[:-3] if scheme_slashes.endswith("://") else "https"
+        return self.prefix + scheme + "/"
+
+    def rewrite_css(self, css):
+        return _CSS_URL_RE.sub(lambda m: m.group(1) + self.mirror_url(m.group(2)), css)
+
+    # Points remote assets of an HTML document at the mirror. Stylesheets
+    # come back with their URLs rewritten, so their SRI hashes no longer
+    # match; the integrity attribute is dropped from rewritten <link> tags.
+    # CSS url()s are only rewritten inside <style> elements and style
+    # attributes, so URLs quoted in slide text or code samples stay as is.
+    def rewrite_html(self, html):
+        def tag(m):
+            rewritten = _ATTR_RE.sub(lambda a: a.group(1) + self.mirror_url(a.group(2)), m.group(0))
+            if rewritten != m.group(0) and m.group(1).lower() == "link":
+                rewritten = _INTEGRITY_RE.sub("", rewritten)
+            return rewritten
+
+        def style_attr(m):
+            return _STYLE_ATTR_RE.sub(lambda a: a.group(1) + self.rewrite_css(a.group(2)), m.group(0))
+
+        html = _TAG_RE.sub(tag, html)
+        html = _STYLE_ELEMENT_RE.sub(lambda m: m.group(1) + self.rewrite_css(m.group(2)) + m.group(3), html)
+        return _ANY_TAG_RE.sub(style_attr, html)
+
+
+_BASE_RE = re.compile(r"""<base\b[^>]*?\bhref\s*=\s*(["'])(.*?)\1[^>]*>""", re.IGNORECASE | re.DOTALL)
+_HEAD_RE = re.compile(r"<head\b[^>]*>", re.IGNORECASE)
+
+
+# Makes a copy of a document stored elsewhere resolve relative URLs as the
+# original did: `base_url` is the original's directory. An existing <base>
+# is resolved against it. The tag carries data-q2p-base so the slide
+# fingerprints can leave it out (it names the upload's directory).
+def with_base(html, base_url):
+    m = _BASE_RE.search(html)
+    if m:
+        href = urllib.parse.urljoin(base_url, m.group(2))
+        return html[:m.start()] + f'<base href="{href}" data-q2p-base>' + html[m.end():]
+    tag = f'<base href="{base_url}" data-q2p-base>'
+    m = _HEAD_RE.search(html)
+    if m:
+        return html[:m.end()] + tag + html[m.end():]
+    return tag + html
+
+
+def get_asset_server():
+    global _server
+    root, mode = asset_settings()
+    if mode == "off":
+        return None
+    cache = get_asset_cache()
+    with _lock:
+        if _server is None:
+            _server = AssetServer(cache, mode)
+            threading.Thread(target=_server.serve_forever, name="asset-mirror", daemon=True).start()
+        return _server
+
+
+# --- seeding -------------------------------------------------------------
+
+class _AssetParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+        self._in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in ("script", "img", "source", "iframe", "video", "audio", "embed") and attrs.get("src"):
+            self.urls.append(attrs["src"])
+        elif tag == "link" and attrs.get("href"):
+            self.urls.append(attrs["href"])
+        if tag == "video" and attrs.get("poster"):
+            self.urls.append(attrs["poster"])
+        # Lazy-loaded media and Reveal.js slide backgrounds
+        for name in ("data-src", "data-background-image", "data-background-video"):
+            if attrs.get(name):
+                self.urls.append(attrs[name])
+        if attrs.get("style"):
+            self.urls.extend(css_urls(attrs["style"]))
+        self._in_style = tag == "style"
+
+    def handle_endtag(self, tag):
+        self._in_style = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            self.urls.extend(css_urls(data))
+
+
+def css_urls(css):
+    found = re.findall(r"""url\(\s*["']?([^"')\s]+)|@import\s+["']([^"']+)""", css)
+    return [a or b for a, b in found if not (a or b).startswith("data:")]
+
+
+def html_urls(html):
+    parser = _AssetParser()
+    parser.feed(html)
+    return [("https:" + url) if url.startswith("//") else url for url in parser.urls]
+
+
+# Local file a document reference points at, or None for remote, data: and
+# in-page URLs
+def _local_path(url, base_dir):
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme == "file":
+        return urllib.request.url2pathname(parsed.path)
+    if parsed.scheme or parsed.netloc or not parsed.path:
+        return None
+    return os.path.normpath(os.path.join(base_dir, urllib.parse.unquote(parsed.path)))
+
+
+# SHA-256 of an HTML document together with the local files it references
+# (figures and stylesheets under *_files/, images, plus what local
+# stylesheets reference in turn). Quarto output that isn't self-contained
+# keeps its figures next to the HTML, so re-rendering a deck can change them
+# while the HTML stays byte-identical; the conversion cache key uses this.
+def hash_document(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    seen = set()
+
+    def add(url, ref_dir, follow_css):
+        local = _local_path(url, ref_dir)
+        if local is None or local in seen:
+            return
+        seen.add(local)
+        rel = os.path.relpath(local, base_dir)
+        try:
+            digest.update(f"{rel}\0{hash_file(local)}\0".encode("utf-8"))
+        except OSError:
+            digest.update(f"{rel}\0missing\0".encode("utf-8"))
+            return
+        if follow_css and local.lower().endswith(".css"):
+            with open(local, "r", encoding="utf-8", errors="replace") as f:
+                for ref in css_urls(f.read()):
+                    add(ref, os.path.dirname(local), False)
+
+    for url in sorted(set(html_urls(data.decode("utf-8", "replace")))):
+        add(url, base_dir, True)
+    return digest.hexdigest()
+
+
+def fetch(url, timeout=30):
+    request = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0 quarto2pdf-asset-seed"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read(), response.headers.get("Content-Type", "application/octet-stream")
+
+
+# Fetches `urls` into the cache, following url()/@import references in CSS
+# (fonts, nested stylesheets). Returns (fetched, skipped, failed) lists.
+def seed(cache, urls, refresh=False, log=print):
+    fetched, skipped, failed = [], [], []
+    queue = [normalize_url(u) for u in urls if is_remote(u)]
+    seen = set()
+    while queue:
+        url = queue.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        entry = cache.get(url)
+        if entry is not None and not refresh:
+            skipped.append(url)
+            body_path, meta = entry
+            if (meta.get("content_type") or "").startswith("text/css"):
+                with open(body_path, "rb") as f:
+                    queue.extend(urllib.parse.urljoin(url, u) for u in css_urls(f.read().decode("utf-8", "replace")))
+            continue
+        try:
+            data, content_type = fetch(url)
+        except Exception as e:
+            failed.append(url)
+            log(f"failed  {url}: {e}")
+            continue
+        cache.put(url, data, content_type)
+        fetched.append(url)
+        log(f"fetched {url} ({len(data)} bytes)")
+        if content_type.startswith("text/css"):
+            queue.extend(urllib.parse.urljoin(url, u) for u in css_urls(data.decode("utf-8", "replace")))
+    return fetched, skipped, failed
+
+
+def _document_urls(paths):
+    urls = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = [os.path.join(root, name) for root, _, names in os.walk(path)
+                     for name in sorted(names) if name.lower().endswith((".html", ".htm"))]
+        else:
+            files = [path]
+        for file in files:
+            with open(file, "r", encoding="utf-8", errors="replace") as f:
+                urls.extend(u for u in html_urls(f.read()) if is_remote(u))
+    return urls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="asset_cache", description="Manage the local CDN asset cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    seed_parser = sub.add_parser("seed", help="Download remote assets into the cache")
+    seed_parser.add_argument("documents", nargs="*", help="HTML files or directories to scan for remote assets")
+    seed_parser.add_argument("--url", action="append", default=[], help="Extra asset URL (repeatable)")
+    seed_parser.add_argument("--from-misses", action="store_true",
+                             help=f"Also fetch the URLs recorded in {MISSES_FILE} by earlier renders")
+    seed_parser.add_argument("--refresh", action="store_true", help="Re-download assets already cached")
+    seed_parser.add_argument("--dir", help="Cache directory (default: $QUARTO2PDF_ASSET_DIR or asset-cache)")
+    sub.add_parser("misses", help=f"List the URLs in {MISSES_FILE}")
+    args = parser.parse_args(argv)
+
+    cache = AssetCache(getattr(args, "dir", None) or asset_settings()[0])
+    if args.command == "misses":
+        for url in cache.misses():
+            print(url)
+        return 0
+
+    urls = _document_urls(args.documents) + args.url
+    if args.from_misses:
+        urls += cache.misses()
+    if not urls:
+        print("error: no remote assets to fetch", file=sys.stderr)
+        return 2
+    fetched, skipped, failed = seed(cache, urls, refresh=args.refresh)
+    if args.from_misses and not failed:
+        cache.clear_misses()
+    print(f"{len(fetched)} fetched, {len(skipped)} already cached, {len(failed)} failed -> {cache.root}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import io
+import os
+import sys
+import json
+import random
+import argparse
+import statistics
+from PIL import Image, ImageDraw, ImageFont
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from output_profiles import OUTPUT_PROFILES, encode_page  # noqa: E402
+
+
+# Size/time tradeoff of the raster output profiles (output_profiles.py) on
+# Selenium screenshots, without a browser:
+#
+#   python benchmarks/encoding.py                      # synthetic frames
+#   QUARTO2PDF_DEBUG_SCREENSHOTS=1 ...                 # keep real screenshots,
+#   python benchmarks/encoding.py output/deck-*/       # then measure those
+#
+# Encode times are per page on one core; conversions spread pages over
+# QUARTO2PDF_ENCODE_WORKERS processes.
+
+
+# A text-only slide (flat) and a slide with a photo-like figure
+def synthetic_frames(count=6, size=(2560, 1440), seed=0):
+    rng = random.Random(seed)
+    font = ImageFont.load_default(size=40)
+    title_font = ImageFont.load_default(size=80)
+    frames = []
+    for i in range(count):
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+        draw.text((120, 100), f"Slide {i + 1}: results", fill=(20, 40, 90), font=title_font)
+        for line in range(8):
+            words = " ".join(rng.choice(["data", "model", "error", "sample", "mean", "test"])
+                             for _ in range(rng.randrange(4, 10)))
+            draw.text((160, 300 + line * 70), f"- {words}", fill=(30, 30, 30), font=font)
+        if i % 2:
+            # Smooth gradient plus noise, like a photo or a heatmap
+            w, h = 1000, 700
+            gradient = Image.linear_gradient("L").resize((w, h))
+            figure = Image.merge("RGB", [gradient, gradient.rotate(90).resize((w, h)),
+                                         Image.effect_noise((w, h), 60)])
+            image.paste(figure, (size[0] - w - 120, 300))
+        buf = io.BytesIO()
+        image.save(buf, "PNG")
+        frames.append((f"synthetic_{i + 1:02d}.png", buf.getvalue()))
+    return frames
+
+
+def load_frames(paths):
+    frames = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(n for n in os.listdir(path) if n.lower().endswith(".png"))
+            files = [os.path.join(path, n) for n in names]
+        else:
+            files = [path]
+        for file in files:
+            with open(file, "rb") as f:
+                frames.append((os.path.basename(file), f.read()))
+    return frames
+
+
+def measure(frames, profile):
+    sizes, times, palette = [], [], 0
+    for _, data in frames:
+        encoded, stats = encode_page(data, profile)
+        sizes.append(stats["bytes"])
+        times.append(stats["seconds"])
+        palette += stats["palette"]
+        width = encoded["size"][0]
+    return {
+        "pages": len(frames),
+        "bytes": sum(sizes),
+        "kb_per_page": round(sum(sizes) / len(frames) / 1024, 1),
+        "ms_per_page": round(statistics.median(times) * 1000, 1),
+        "palette_pages": palette,
+        "pixel_width": width,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare raster output profiles on screenshots.")
+    parser.add_argument("inputs", nargs="*", help="PNG screenshots or directories of them (default: synthetic)")
+    parser.add_argument("-p", "--profiles", nargs="+", choices=sorted(OUTPUT_PROFILES), default=list(OUTPUT_PROFILES))
+    parser.add_argument("--out", metavar="FILE", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.inputs) if args.inputs else synthetic_frames()
+    if not frames:
+        print("error: no PNG files found", file=sys.stderr)
+        return 2
+    source_bytes = sum(len(data) for _, data in frames)
+
+    results = []
+    for name in args.profiles:
+        result = measure(frames, OUTPUT_PROFILES[name])
+        result["profile"] = name
+        result["vs_png"] = round(result["bytes"] / source_bytes, 3)
+        results.append(result)
+
+    header = f"{'profile':<10} {'pages':>6} {'KB/page':>9} {'vs PNG':>7} {'ms/page':>8} {'palette':>8} {'width px':>9}"
+    print(f"{len(frames)} frames, {source_bytes / len(frames) / 1024:.1f} KB/page as PNG")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['profile']:<10} {r['pages']:>6} {r['kb_per_page']:>9.1f} {r['vs_png']:>7.2f} "
+              f"{r['ms_per_page']:>8.1f} {r['palette_pages']:>8} {r['pixel_width']:>9}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
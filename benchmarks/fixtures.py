@@ -0,0 +1,197 @@
+import os
+import json
+import random
+from PIL import Image, ImageDraw
+
+
+# Synthetic Quarto/Reveal.js decks for benchmarking. Everything is local:
+# instead of the real Reveal.js and Bootstrap bundles (which come from a CDN),
+# each deck inlines a small shim with the same DOM structure and the parts of
+# the API the converters rely on (next button at
+# /html/body/div[3]/aside/button[2], Reveal.getSlides/slide/on, the
+# "slidechanged" event and Bootstrap-style tabsets, whose shown.bs.tab is not
+# sent for a tab that is already active).
+
+PROFILES = {
+    "small":  {"slides": 10, "tabsets": 0, "tabs": 0, "images": 1, "image_size": (800, 600),
+               "equations": 2, "code_lines": 20},
+    "tabs":   {"slides": 20, "tabsets": 2, "tabs": 4, "images": 0, "image_size": (800, 600),
+               "equations": 0, "code_lines": 10},
+    "images": {"slides": 20, "tabsets": 0, "tabs": 0, "images": 4, "image_size": (1920, 1080),
+               "equations": 0, "code_lines": 0},
+    "math":   {"slides": 20, "tabsets": 0, "tabs": 0, "images": 0, "image_size": (800, 600),
+               "equations": 30, "code_lines": 0},
+    "code":   {"slides": 20, "tabsets": 0, "tabs": 0, "images": 0, "image_size": (800, 600),
+               "equations": 0, "code_lines": 200},
+    "large":  {"slides": 60, "tabsets": 1, "tabs": 3, "images": 2, "image_size": (1600, 900),
+               "equations": 5, "code_lines": 40},
+    # Long document for the print-scaling pass: 1,200 tabpanels
+    "panels": {"slides": 60, "tabsets": 4, "tabs": 5, "images": 0, "image_size": (800, 600),
+               "equations": 0, "code_lines": 30},
+}
+
+SHIM_JS = r"""
+(function () {
+  var slides = Array.prototype.slice.call(document.querySelectorAll(".reveal .slides > section"));
+  var current = 0;
+  var listeners = {};
+  var prev = document.querySelector(".controls .navigate-left");
+  var next = document.querySelector(".controls .navigate-right");
+
+  function emit(name, detail) {
+    (listeners[name] || []).forEach(function (fn) { fn(detail); });
+    var ev = new CustomEvent(name, { bubbles: true, detail: detail });
+    document.querySelector(".reveal").dispatchEvent(ev);
+  }
+
+  function show(h) {
+    h = Math.max(0, Math.min(slides.length - 1, h));
+    slides.forEach(function (s, i) {
+      s.className = i < h ? "past" : i > h ? "future" : "present";
+      s.style.display = i === h ? "block" : "none";
+    });
+    var changed = h !== current;
+    current = h;
+    next.style.display = h < slides.length - 1 ? "block" : "none";
+    prev.style.display = h > 0 ? "block" : "none";
+    if (changed) emit("slidechanged", { indexh: h, indexv: 0 });
+  }
+
+  window.Reveal = {
+    getSlides: function () { return slides.slice(); },
+    getTotalSlides: function () { return slides.length; },
+    getIndices: function () { return { h: current, v: 0, f: undefined }; },
+    slide: function (h) { show(h); },
+    next: function () { show(current + 1); },
+    prev: function () { show(current - 1); },
+    isReady: function () { return true; },
+    on: function (name, fn) { (listeners[name] = listeners[name] || []).push(fn); },
+    off: function (name, fn) { listeners[name] = (listeners[name] || []).filter(function (f) { return f !== fn; }); }
+  };
+
+  // Marks the page as using Bootstrap, so tab clicks wait for shown.bs.tab
+  window.bootstrap = { Tab: function () {} };
+
+  next.addEventListener("click", function () { show(current + 1); });
+  prev.addEventListener("click", function () { show(current - 1); });
+
+  document.querySelectorAll("[data-bs-toggle='tab']").forEach(function (tab) {
+    tab.addEventListener("click", function (e) {
+      e.preventDefault();
+      // Like Bootstrap's Tab.show(): the active tab sends no shown.bs.tab
+      if (tab.classList.contains("active")) return;
+      var nav = tab.closest(".nav");
+      nav.querySelectorAll(".nav-link").forEach(function (t) { t.classList.remove("active"); });
+      tab.classList.add("active");
+      var content = nav.nextElementSibling;
+      content.querySelectorAll(".tab-pane").forEach(function (p) { p.classList.remove("active"); });
+      content.querySelector(tab.getAttribute("href")).classList.add("active");
+      tab.dispatchEvent(new Event("shown.bs.tab", { bubbles: true }));
+    });
+  });
+
+  show(0);
+})();
+"""
+
+STYLE = """
+body { margin: 0; font-family: sans-serif; background: #fff; }
+.reveal .slides > section { padding: 40px 80px; }
+.tab-pane { display: none; }
+.tab-pane.active { display: block; }
+.nav { list-style: none; display: flex; gap: 12px; padding: 0; }
+.nav-link.active { font-weight: bold; border-bottom: 2px solid #447099; }
+.controls { position: fixed; right: 20px; bottom: 20px; display: flex; gap: 8px; }
+.controls button { width: 40px; height: 40px; }
+.controls-arrow { width: 100%; height: 100%; }
+img { max-width: 45%; margin: 8px; }
+pre { font-size: 12px; background: #f6f6f6; padding: 8px; }
+"""
+
+
+def _write_image(path, size, seed):
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(image)
+    # Shapes rather than noise so the JPEG/PNG sizes look like real figures
+    for _ in range(40):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        x1, y1 = x0 + rng.randrange(size[0] // 4 + 1), y0 + rng.randrange(size[1] // 4 + 1)
+        draw.rectangle([x0, y0, x1, y1], fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    image.save(path)
+
+
+def _slide_html(index, profile, asset_dir, rng):
+    parts = [f"<h2>Slide {index + 1}</h2>", f"<p>Synthetic benchmark content for slide {index + 1}.</p>"]
+
+    for i in range(profile["images"]):
+        name = f"img_{index:03d}_{i}.png"
+        _write_image(os.path.join(asset_dir, name), profile["image_size"], seed=index * 100 + i)
+        parts.append(f'<img src="assets/{name}" alt="figure {i}">')
+
+    for i in range(profile["equations"]):
+        a, b = rng.randrange(2, 9), rng.randrange(2, 9)
+        parts.append(f'<p><span class="math inline">\\(\\int_0^{a} x^{b}\\,dx = \\frac{{{a}^{b + 1}}}{{{b + 1}}}\\)</span></p>')
+
+    if profile["code_lines"]:
+        lines = "\n".join(f"result_{i} = compute({i}, factor={i % 7})  # line {i}" for i in range(profile["code_lines"]))
+        parts.append(f'<pre><code class="sourceCode python">{lines}</code></pre>')
+
+    for t in range(profile["tabsets"]):
+        base = f"ts-{index}-{t}"
+        tabs = "".join(
+            f'<li class="nav-item"><a class="nav-link{" active" if k == 0 else ""}" role="tab" '
+            f'data-bs-toggle="tab" href="#{base}-{k}">Tab {k + 1}</a></li>'
+            for k in range(profile["tabs"])
+        )
+        panes = "".join(
+            f'<div class="tab-pane{" active" if k == 0 else ""}" id="{base}-{k}" role="tabpanel">'
+            f'<p>Content of tab {k + 1} in tabset {t + 1}.</p></div>'
+            for k in range(profile["tabs"])
+        )
+        parts.append(f'<div class="panel-tabset"><ul class="nav nav-tabs" role="tablist">{tabs}</ul>'
+                     f'<div class="tab-content">{panes}</div></div>')
+
+    return f"<section>{''.join(parts)}</section>"
+
+
+def generate_fixture(name, out_dir, profile=None, mathjax_src=None):
+    profile = dict(profile or PROFILES[name])
+    deck_dir = os.path.join(out_dir, name)
+    asset_dir = os.path.join(deck_dir, "assets")
+    os.makedirs(asset_dir, exist_ok=True)
+    rng = random.Random(name)
+
+    slides = "\n".join(_slide_html(i, profile, asset_dir, rng) for i in range(profile["slides"]))
+    mathjax = f'<script src="{mathjax_src}"></script>' if mathjax_src else ""
+    html = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Benchmark deck: {name}</title>
+<style>{STYLE}</style>
+{mathjax}
+</head>
+<body>
+<div id="quarto-header"></div>
+<div id="quarto-search"></div>
+<div class="reveal">
+<aside class="controls"><button class="navigate-left"><div class="controls-arrow"></div></button><button class="navigate-right"><div class="controls-arrow"></div></button></aside>
+<div class="slides">
+{slides}
+</div>
+</div>
+<script>{SHIM_JS}</script>
+</body>
+</html>
+"""
+    path = os.path.join(deck_dir, f"{name}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    with open(os.path.join(deck_dir, "profile.json"), "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2, default=list)
+    return path
+
+
+def generate_all(out_dir, names=None, mathjax_src=None):
+    return {name: generate_fixture(name, out_dir, mathjax_src=mathjax_src) for name in (names or PROFILES)}
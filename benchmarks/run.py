@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fixtures import PROFILES, generate_all  # noqa: E402
+from converter import get_method  # noqa: E402
+from conversion_cache import TOOL_VERSION  # noqa: E402
+from procstats import RssSampler  # noqa: E402
+from metrics import JobMetrics  # noqa: E402
+
+
+# Benchmark harness: renders the synthetic decks from fixtures.py with each
+# method and reports wall time, pages/sec, peak RSS of the whole process tree
+# (browsers included) and output size. The JSON report also has the median
+# time of every conversion stage (e.g. Puppeteer's layout_scaling), so a
+# change to one stage can be measured on its own.
+#
+#   python benchmarks/run.py                          # all fixtures, both methods
+#   python benchmarks/run.py -f tabs large -m selenium --repeat 5
+#   python benchmarks/run.py --out new.json --compare baseline.json
+#
+# With --compare, the exit code is 1 when any fixture/method got slower than
+# the baseline by more than --threshold percent.
+
+
+def count_pdf_pages(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    # Page objects, not the /Pages tree node
+    return data.count(b"/Type /Page") - data.count(b"/Type /Pages") if data else 0
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_once(method, html_path):
+    work_dir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        with RssSampler() as sampler:
+            started = time.perf_counter()
+            metrics = JobMetrics(method.cache_id)
+            pdf_path, slides = method.process_file(html_path, work_dir, metrics=metrics)
+            elapsed = time.perf_counter() - started
+        size = os.path.getsize(pdf_path) if pdf_path else 0
+        pages = count_pdf_pages(pdf_path) if pdf_path else 0
+        return {"seconds": elapsed, "slides": slides, "pages": pages,
+                "bytes": size, "peak_rss": sampler.peak, "stages": dict(metrics.stages)}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def benchmark(method_name, fixture, html_path, repeat, warmup):
+    # Always capture: with the slide cache, every run after the warmup would
+    # only measure cache hits
+    method = get_method(method_name, incremental=False) if method_name == "selenium" else get_method(method_name)
+    for _ in range(warmup):
+        run_once(method, html_path)
+
+    runs = [run_once(method, html_path) for _ in range(repeat)]
+    seconds = [r["seconds"] for r in runs]
+    median = statistics.median(seconds)
+    pages = runs[-1]["pages"]
+    stages = {name: round(statistics.median(r["stages"].get(name, 0.0) for r in runs), 4)
+              for name in sorted({name for r in runs for name in r["stages"]})}
+    return {
+        "fixture": fixture,
+        "method": method_name,
+        "runs": len(runs),
+        "median_seconds": round(median, 4),
+        "min_seconds": round(min(seconds), 4),
+        "max_seconds": round(max(seconds), 4),
+        "pages": pages,
+        "pages_per_second": round(pages / median, 3) if median else None,
+        "peak_rss_mb": round(max(r["peak_rss"] for r in runs) / (1024 * 1024), 1),
+        "output_mb": round(runs[-1]["bytes"] / (1024 * 1024), 3),
+        "stage_seconds": stages,
+    }
+
+
+def compare(results, baseline, threshold):
+    previous = {(r["fixture"], r["method"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = previous.get((r["fixture"], r["method"]))
+        if not old or not old.get("median_seconds"):
+            continue
+        change = (r["median_seconds"] - old["median_seconds"]) / old["median_seconds"] * 100
+        r["change_percent"] = round(change, 1)
+        if change > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def print_table(results):
+    header = f"{'fixture':<8} {'method':<10} {'median s':>9} {'pages':>6} {'pages/s':>8} {'peak MB':>8} {'out MB':>8} {'change':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        change = f"{r['change_percent']:+.1f}%" if "change_percent" in r else ""
+        print(f"{r['fixture']:<8} {r['method']:<10} {r['median_seconds']:>9.2f} {r['pages']:>6} "
+              f"{r['pages_per_second'] or 0:>8.2f} {r['peak_rss_mb']:>8.1f} {r['output_mb']:>8.2f} {change:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Quarto2PDF on synthetic decks.")
+    parser.add_argument("-f", "--fixtures", nargs="+", choices=sorted(PROFILES), default=sorted(PROFILES))
+    parser.add_argument("-m", "--methods", nargs="+", choices=["selenium", "puppeteer"],
+                        default=["selenium", "puppeteer"])
+    parser.add_argument("--repeat", type=int, default=3, help="Measured runs per fixture and method")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs first (browser start-up)")
+    parser.add_argument("--fixtures-dir", default=os.path.join(ROOT, "output", "bench-fixtures"))
+    parser.add_argument("--mathjax", metavar="URL", help="Local MathJax bundle to include in the decks")
+    parser.add_argument("--out", metavar="FILE", help="Write results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=15.0,
+                        help="Slowdown in percent that counts as a regression (default: 15)")
+    args = parser.parse_args(argv)
+
+    decks = generate_all(args.fixtures_dir, args.fixtures, mathjax_src=args.mathjax)
+
+    results = []
+    for fixture in args.fixtures:
+        for method_name in args.methods:
+            print(f"Running {fixture} / {method_name} …", file=sys.stderr)
+            try:
+                results.append(benchmark(method_name, fixture, decks[fixture], args.repeat, args.warmup))
+            except Exception as e:
+                print(f"  failed: {e}", file=sys.stderr)
+                results.append({"fixture": fixture, "method": method_name, "error": str(e)})
+
+    ok = [r for r in results if "error" not in r]
+    regressions = []
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(ok, json.load(f), args.threshold)
+
+    print_table(ok)
+
+    report = {
+        "version": TOOL_VERSION,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%:", file=sys.stderr)
+        for r in regressions:
+            print(f"  {r['fixture']} / {r['method']}: {r['change_percent']:+.1f}%", file=sys.stderr)
+        return 1
+    return 0 if len(ok) == len(results) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
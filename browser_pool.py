@@ -0,0 +1,210 @@
+import os
+import time
+import atexit
+import threading
+from selenium import webdriver
+
+
+DEFAULT_WINDOW_SIZE = "2560,1440"
+BROWSER_ORDER = ["edge", "chrome"]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _browser_options(browser, window_size, offline=False):
+    if browser == "edge":
+        from selenium.webdriver.edge.options import Options
+    else:
+        from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument(f"--window-size={window_size}")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-setuid-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    if offline:
+        # Unknown hosts fail at DNS resolution instead of timing out; cached
+        # CDN assets come from the local mirror (see asset_cache.py)
+        options.add_argument("--host-resolver-rules=MAP * ~NOTFOUND, EXCLUDE 127.0.0.1")
+    return options
+
+
+def _launch(browser, window_size, offline=False):
+    options = _browser_options(browser, window_size, offline)
+    if browser == "edge":
+        return webdriver.Edge(options=options)
+    return webdriver.Chrome(options=options)
+
+
+class PooledDriver:
+    def __init__(self, driver, browser):
+        self.driver = driver
+        self.browser = browser
+        self.uses = 0
+
+
+# Keeps a fixed number of headless browsers alive between conversions.
+# Drivers are health-checked when handed out and recycled after max_uses
+# documents so long-running instances don't accumulate browser state.
+class BrowserPool:
+    def __init__(self, size=2, max_uses=25, window_size=DEFAULT_WINDOW_SIZE, browser=None, offline=False):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.window_size = window_size
+        self.offline = offline
+        self.browser = browser  # Remembered after the first successful launch
+
+        # Idle drivers (most recently used last) and the count of live ones,
+        # both guarded by _cond; waiters are woken when a driver comes back or
+        # one is discarded, so freed capacity is used at once
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self._failed_browsers = set()
+        self._closed = False
+
+    def _candidates(self):
+        if self.browser:
+            return [self.browser]
+        return [b for b in BROWSER_ORDER if b not in self._failed_browsers]
+
+    def _create(self):
+        last_error = None
+        for browser in self._candidates():
+            try:
+                driver = _launch(browser, self.window_size, self.offline)
+            except Exception as e:
+                last_error = e
+                self._failed_browsers.add(browser)
+                continue
+            self.browser = browser
+            return PooledDriver(driver, browser)
+
+        # Nothing worked; forget the failures so a later attempt can retry
+        self._failed_browsers.clear()
+        raise RuntimeError(f"Could not start a browser for Selenium: {last_error}")
+
+    def _is_healthy(self, entry):
+        try:
+            entry.driver.execute_script("return 1;")
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, entry):
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    # Waits until a driver is idle or another may be created. Returns the
+    # idle entry, or None after reserving a slot for a new browser.
+    def _claim(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free browser")
+                self._cond.wait(remaining)
+
+    def acquire(self, timeout=None):
+        while True:
+            entry = self._claim(timeout)
+            if entry is None:
+                try:
+                    return self._create()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+            if self._is_healthy(entry):
+                return entry
+            self._discard(entry)
+
+    def release(self, entry, broken=False):
+        entry.uses += 1
+        if broken or self._closed or entry.uses >= self.max_uses:
+            self._discard(entry)
+            return
+
+        try:
+            entry.driver.get("about:blank")
+        except Exception:
+            self._discard(entry)
+            return
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    # timeout=0 returns a lease that fails with TimeoutError right away when
+    # every browser is busy and the pool is full
+    def driver(self, timeout=None):
+        return _PoolLease(self, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+
+class _PoolLease:
+    def __init__(self, pool, timeout=None):
+        self.pool = pool
+        self.timeout = timeout
+        self.entry = None
+        self.acquire_seconds = 0.0
+        self.launched = False  # True when a new browser had to be started
+
+    def __enter__(self):
+        started = time.perf_counter()
+        self.entry = self.pool.acquire(self.timeout)
+        self.acquire_seconds = time.perf_counter() - started
+        self.launched = self.entry.uses == 0
+        return self.entry.driver
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self.entry, broken=exc_type is not None)
+        return False
+
+
+# Shared pool for the process. Streamlit re-executes the script on every
+# rerun but keeps imported modules, so the browsers survive reruns.
+def get_browser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = BrowserPool(
+                size=int(os.environ.get("QUARTO2PDF_POOL_SIZE", "2")),
+                max_uses=int(os.environ.get("QUARTO2PDF_POOL_MAX_USES", "25")),
+                browser=os.environ.get("QUARTO2PDF_BROWSER") or None,
+                offline=os.environ.get("QUARTO2PDF_ASSETS") == "offline",
+            )
+        return _pool
+
+
+def shutdown_browser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+atexit.register(shutdown_browser_pool)
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import contextlib
+from converter import CAPTURE_MODES, ConversionError, METHODS, get_method, make_job
+from output_profiles import OUTPUT_PROFILES
+from scheduler import ConversionScheduler, default_concurrency
+from conversion_cache import get_conversion_cache
+from metrics import get_metrics_registry
+
+
+# Batch conversion without the web UI, e.g. from cron:
+#   python cli.py decks/ -o pdfs/ --method puppeteer -j 4
+#   python cli.py jobs.jsonl --summary summary.json
+#
+# A manifest is a JSON-lines file with one job per line:
+#   {"input": "lecture1.html", "output": "pdf/lecture1.pdf", "method": "selenium", "profile": "screen"}
+# Only "input" is required; relative paths are resolved against the manifest.
+# "profile" picks the raster output profile and "capture" raster or vector
+# pages; both only apply to selenium.
+#
+# Exit codes: 0 all files converted, 1 at least one failed, 2 bad arguments.
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def read_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                raise ConversionError(f"{path}:{line_no}: invalid JSON ({e})")
+            if not isinstance(entry, dict) or not entry.get("input"):
+                raise ConversionError(f"{path}:{line_no}: every job needs an \"input\"")
+            entry["input"] = os.path.join(base, entry["input"])
+            if entry.get("output"):
+                entry["output"] = os.path.join(base, entry["output"])
+            entries.append(entry)
+    return entries
+
+
+def collect_entries(inputs, recursive=False):
+    entries = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith((".html", ".htm")):
+                        path = os.path.join(root, name)
+                        # Kept for the output path, so a/index.html and
+                        # b/index.html don't both become index.pdf
+                        entries.append({"input": path, "relative": os.path.relpath(path, item)})
+                if not recursive:
+                    break
+        elif item.lower().endswith((".jsonl", ".ndjson")):
+            entries.extend(read_manifest(item))
+        elif os.path.isfile(item):
+            entries.append({"input": item})
+        else:
+            raise ConversionError(f"Input not found: {item}")
+    return entries
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="quarto2pdf",
+        description="Convert Quarto HTML files to PDF without starting the web UI."
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="HTML files, directories of HTML files, or .jsonl job manifests")
+    parser.add_argument("-m", "--method", choices=sorted(METHODS), default="selenium",
+                        help="Conversion method for jobs that don't choose one (default: selenium)")
+    parser.add_argument("-p", "--profile", choices=sorted(OUTPUT_PROFILES), default=None,
+                        help="Raster output profile for selenium jobs that don't choose one "
+                             "(default: $QUARTO2PDF_PROFILE or standard)")
+    parser.add_argument("--capture", choices=CAPTURE_MODES, default=None,
+                        help="Selenium page capture: raster screenshots or vector print-to-PDF "
+                             "(default: $QUARTO2PDF_CAPTURE or raster)")
+    parser.add_argument("-o", "--output-dir", default="pdf",
+                        help="Where PDFs go when a job has no explicit output, keeping subdirectories of "
+                             "input directories (default: pdf)")
+    parser.add_argument("-j", "--workers", type=int, default=default_concurrency(),
+                        help="Files converted in parallel")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Also search subdirectories of input directories")
+    parser.add_argument("--work-dir", default="output",
+                        help="Scratch space for in-progress conversions (default: output)")
+    parser.add_argument("--keep-work", action="store_true",
+                        help="Don't delete per-job scratch directories")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always render, even if an identical conversion is cached")
+    parser.add_argument("--summary", metavar="FILE",
+                        help="Write the JSON result summary here instead of stdout")
+    parser.add_argument("--prometheus", metavar="FILE",
+                        help="Also write aggregate metrics in Prometheus text format "
+                             "(e.g. for node_exporter's textfile collector)")
+    return parser
+
+
+def run(args):
+    try:
+        entries = collect_entries(args.inputs, args.recursive)
+    except ConversionError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE, None
+    if not entries:
+        print("error: no HTML files found", file=sys.stderr)
+        return EXIT_USAGE, None
+
+    # Default outputs mirror each file's place under its input directory;
+    # two jobs writing the same PDF would silently overwrite each other
+    targets = {}
+    for entry in entries:
+        relative = entry.get("relative") or os.path.basename(entry["input"])
+        entry["output"] = entry.get("output") or os.path.join(args.output_dir, os.path.splitext(relative)[0] + ".pdf")
+        target = os.path.normcase(os.path.abspath(entry["output"]))
+        if target in targets:
+            print(f"error: {targets[target]} and {entry['input']} would both be written to {entry['output']}",
+                  file=sys.stderr)
+            return EXIT_USAGE, None
+        targets[target] = entry["input"]
+
+    methods = {}
+    jobs = []
+    for entry in entries:
+        name = entry.get("method") or args.method
+        options = {}
+        if name == "selenium":
+            options["profile"] = entry.get("profile") or args.profile
+            options["capture"] = entry.get("capture") or args.capture
+        key = (name, options.get("profile"), options.get("capture"))
+        try:
+            if key not in methods:
+                methods[key] = get_method(name, **options)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return EXIT_USAGE, None
+        job = make_job(entry["input"], args.work_dir, method=methods[key])
+        job.method_name = name
+        job.target = entry["output"]
+        jobs.append(job)
+
+    # Every job carries its own method, so the scheduler needs no default
+    scheduler = ConversionScheduler(None, max_workers=max(1, args.workers),
+                                    cache=None if args.no_cache else get_conversion_cache())
+
+    started = time.time()
+    results = []
+    for event in scheduler.run(jobs):
+        if event[0] != "done":
+            continue
+        result = event[1]
+        job = result.job
+        record = {
+            "input": os.path.abspath(job.file_path),
+            "output": None,
+            "method": job.method_name,
+            "profile": getattr(job.method, "profile", None),
+            "capture": getattr(job.method, "capture", None),
+            "status": "ok" if result.ok else "error",
+            "pages": result.pages,
+            "cached": result.cached,
+            "elapsed": round(result.elapsed, 3),
+            "error": result.error,
+            "metrics": result.metrics,
+        }
+        if result.ok:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(job.target)), exist_ok=True)
+                # Cached PDFs stay put while they are copied out
+                reading = scheduler.cache.reading if scheduler.cache else contextlib.nullcontext
+                with reading(result.pdf_path):
+                    shutil.copyfile(result.pdf_path, job.target)
+                record["output"] = os.path.abspath(job.target)
+            except OSError as e:
+                record["status"] = "error"
+                record["error"] = f"Could not write {job.target}: {e}"
+        if not args.keep_work:
+            shutil.rmtree(job.output_dir, ignore_errors=True)
+
+        mark = "ok" if record["status"] == "ok" else "FAILED"
+        print(f"[{len(results) + 1}/{len(jobs)}] {mark} {job.name} ({record['elapsed']}s)", file=sys.stderr)
+        results.append(record)
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    summary = {
+        "total": len(results),
+        "ok": len(results) - failed,
+        "failed": failed,
+        "cached": sum(1 for r in results if r["cached"]),
+        "elapsed": round(time.time() - started, 3),
+        "results": results,
+    }
+    return (EXIT_FAILED if failed else EXIT_OK), summary
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    code, summary = run(args)
+    if summary is not None:
+        text = json.dumps(summary, indent=2)
+        if args.summary:
+            with open(args.summary, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+    if args.prometheus:
+        with open(args.prometheus, "w", encoding="utf-8") as f:
+            f.write(get_metrics_registry().to_prometheus())
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+# Bump when a change in rendering should invalidate previously cached PDFs
+TOOL_VERSION = "1.2.0"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash, method_id, options=None):
+    payload = json.dumps({
+        "content": content_hash,
+        "method": method_id,
+        "options": options or {},
+        "version": TOOL_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _atomic_write(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# Finished PDFs stored by cache key (content hash + method + render options +
+# tool version). Entries are written to a temp file and renamed into place,
+# so a reader never sees a half-written PDF even with several jobs (or
+# processes) sharing the directory. The least recently used entries are
+# evicted once the directory grows past max_bytes, except those still in use
+# in this process: an entry whose path get() or put() handed out within the
+# last `lease` seconds (the job it went to may not have opened it yet), and
+# entries open in a reading() block.
+class ConversionCache:
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024, lease=300.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._leases = {}   # key -> monotonic time the lease ends
+        self._readers = {}  # key -> open reading() blocks
+        os.makedirs(self.root, exist_ok=True)
+
+    def _hand_out(self, key):
+        with self._lock:
+            self._leases[key] = time.monotonic() + self.lease
+
+    # Keeps the entry at `pdf_path` (as returned by get/put) from being
+    # evicted while the block runs, e.g. while copying it elsewhere
+    @contextmanager
+    def reading(self, pdf_path):
+        key = os.path.splitext(os.path.basename(pdf_path))[0]
+        with self._lock:
+            self._readers[key] = self._readers.get(key, 0) + 1
+        try:
+            yield pdf_path
+        finally:
+            with self._lock:
+                self._readers[key] -= 1
+                if not self._readers[key]:
+                    del self._readers[key]
+
+    def _in_use(self):
+        now = time.monotonic()
+        for key in [k for k, until in self._leases.items() if until < now]:
+            del self._leases[key]
+        return set(self._leases) | set(self._readers)
+
+    def _paths(self, key):
+        return (os.path.join(self.root, f"{key}.pdf"),
+                os.path.join(self.root, f"{key}.json"))
+
+    def get(self, key):
+        pdf_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if not os.path.exists(pdf_path):
+                return None
+            # Touch both files: mtime is the LRU clock
+            now = time.time()
+            os.utime(pdf_path, (now, now))
+            os.utime(meta_path, (now, now))
+        except (OSError, ValueError):
+            return None
+        self._hand_out(key)
+        return pdf_path, meta
+
+    def put(self, key, source_pdf, meta=None):
+        pdf_path, meta_path = self._paths(key)
+        meta = dict(meta or {})
+        meta["created"] = time.time()
+
+        def copy_pdf(out):
+            with open(source_pdf, "rb") as src:
+                for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                    out.write(chunk)
+
+        # PDF first, metadata last: an entry only counts once its .json exists
+        _atomic_write(pdf_path, copy_pdf)
+        _atomic_write(meta_path, lambda out: out.write(json.dumps(meta).encode("utf-8")))
+
+        self._hand_out(key)
+        self.evict()
+        return pdf_path
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            pdf_path, meta_path = self._paths(key)
+            try:
+                size = os.path.getsize(pdf_path) + os.path.getsize(meta_path)
+                used = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((used, size, key))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            in_use = self._in_use()
+            for _, size, key in entries:
+                if total <= self.max_bytes:
+                    break
+                if key in in_use:
+                    continue
+                for path in reversed(self._paths(key)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+
+
+def get_conversion_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ConversionCache(
+                os.environ.get("QUARTO2PDF_CACHE_DIR", os.path.join("output", "cache")),
+                max_bytes=int(os.environ.get("QUARTO2PDF_CACHE_MAX_MB", "1024")) * 1024 * 1024,
+            )
+        return _cache
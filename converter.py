@@ -0,0 +1,603 @@
+import os
+import time
+import base64
+import shutil
+import pathlib
+import threading
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.print_page_options import PrintOptions
+from browser_pool import get_browser_pool
+from puppeteer_worker import get_puppeteer_worker
+from scheduler import ConversionJob, ConversionScheduler
+from conversion_cache import get_conversion_cache
+from pdf_writer import PdfAssembler, VectorAssembler
+from page_ready import SLIDE_EVENTS, TAB_EVENTS, click_and_settle, settle_timeouts
+from navigation import RevealNavigator, find_tabs
+from asset_cache import asset_settings, get_asset_server, with_base
+from sharding import FrameSequencer, SlideQueue, plan_shards, shard_settings
+from incremental import RecordingSink, get_slide_cache, incremental_settings, slide_fingerprints
+from metrics import JobMetrics
+from memory_governor import get_memory_governor
+from workspace import Workspace, get_workspace
+from dedup import FrameDeduplicator
+from output_profiles import OUTPUT_PROFILES, PAGE_WIDTH_IN, get_profile
+
+
+# Conversion engine shared by the Streamlit app (main.py) and the batch CLI
+# (cli.py). Nothing here imports Streamlit; errors are raised, not displayed.
+
+CAPTURE_MODES = ("raster", "vector")
+
+
+# Raised by the methods instead of writing to the page, since conversions run
+# on scheduler threads and outside Streamlit
+class ConversionError(Exception):
+    pass
+
+
+# Method 1: Selenium-based screenshot capture with tab support
+class SeleniumMethod:
+    def __init__(self, save_screenshots=None, slide_settle_ms=None, tab_settle_ms=None,
+                 dedup_mode=None, dedup_threshold=None, profile=None, navigation=None, shards=None,
+                 incremental=None, capture=None):
+        self.name = "Method 1: Selenium Screenshot Capture"
+        self.cache_id = "selenium"
+        # Ceilings for waiting on the page after a slide advance or tab click
+        default_slide_ms, default_tab_ms = settle_timeouts()
+        self.slide_settle_ms = slide_settle_ms or default_slide_ms
+        self.tab_settle_ms = tab_settle_ms or default_tab_ms
+        # PNGs on disk are only a debugging aid; pages go to the PDF in memory
+        if save_screenshots is None:
+            save_screenshots = os.environ.get("QUARTO2PDF_DEBUG_SCREENSHOTS") == "1"
+        self.save_screenshots = save_screenshots
+        # Repeated frames (e.g. a "full" shot identical to the first tab) are dropped
+        default_dedup = FrameDeduplicator.from_env()
+        self.dedup_mode = dedup_mode or default_dedup.mode
+        self.dedup_threshold = default_dedup.threshold if dedup_threshold is None else dedup_threshold
+        # "reveal" jumps between slides with the Reveal.js API (falling back to
+        # the next button for other documents); "next" always clicks through
+        self.navigation = navigation or os.environ.get("QUARTO2PDF_NAVIGATION", "reveal")
+        if self.navigation not in ("reveal", "next"):
+            raise ValueError(f"Unknown navigation '{self.navigation}', expected 'reveal' or 'next'")
+        # Browsers used for one large Reveal.js deck (see sharding.py)
+        default_shards, self.shard_min_slides = shard_settings()
+        self.shards = shards or default_shards
+        # Raster encoding and DPI of the PDF pages (see output_profiles.py)
+        self.profile = get_profile(profile)[0]
+        # "raster" screenshots every slide/tab state; "vector" prints each state
+        # to a one-page PDF instead (selectable text, far smaller files), and
+        # the profile's raster settings don't apply
+        self.capture = capture or os.environ.get("QUARTO2PDF_CAPTURE", "raster")
+        if self.capture not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture '{self.capture}', expected one of: {', '.join(CAPTURE_MODES)}")
+        # Reuse frames of slides unchanged since an earlier run (see incremental.py)
+        self.incremental = incremental_settings()[0] if incremental is None else incremental
+        self.description = """
+        **Features:**
+        - Uses Selenium WebDriver with Edge browser
+        - Captures screenshots of each page and tab
+        - Supports interactive tab navigation
+        - Creates PDF from multiple screenshots
+        - Better for complex interactive content
+
+        **Advantages:**
+        - Handles dynamic content well
+        - Captures tabs separately
+        - Good for debugging (visual screenshots)
+        - Works with JavaScript-heavy pages
+
+        **Disadvantages:**
+        - Larger file sizes (image-based PDF)
+        - Slower processing
+        - Requires browser installation
+        - May miss some styling details
+        """
+
+    # Everything that changes the output for the same HTML; part of the cache key
+    def render_options(self):
+        if self.capture == "vector":
+            return {"viewport": "2560x1440", "format": "vector-pages", "navigation": self.navigation,
+                    "page_width_in": PAGE_WIDTH_IN, "dedup": self.dedup_mode, "assets": asset_settings()[1]}
+        return {"viewport": "2560x1440", "format": "png-pages", "navigation": self.navigation,
+                "profile": self.profile, "encoding": OUTPUT_PROFILES[self.profile],
+                "dedup": self.dedup_mode, "dedup_threshold": self.dedup_threshold,
+                "assets": asset_settings()[1]}
+
+    def wait_for_visible(self, driver, by, selector, timeout=5):
+        try:
+            return WebDriverWait(driver, timeout).until(
+                EC.visibility_of_element_located((by, selector))
+            )
+        except TimeoutException:
+            return None
+
+    # Screenshot bytes straight from the browser, without touching the disk
+    def capture_png(self, driver):
+        try:
+            data = driver.execute_cdp_cmd("Page.captureScreenshot", {"format": "png"})
+            return base64.b64decode(data["data"])
+        except Exception:
+            # Non-Chromium driver or CDP unavailable
+            return driver.get_screenshot_as_png()
+
+    # Emulates screen media so print keeps the on-screen layout instead of
+    # the deck's print stylesheets. Lasts for the loaded document.
+    def prepare_capture(self, driver):
+        if self.capture != "vector":
+            return
+        try:
+            driver.execute_cdp_cmd("Emulation.setEmulatedMedia", {"media": "screen"})
+        except Exception:
+            pass  # Non-Chromium driver
+
+    # One-page PDF of the current state, without touching the disk. The
+    # paper is PAGE_WIDTH_IN wide and scaled so its layout width equals the
+    # window's, i.e. the slide is laid out exactly as on screen.
+    def capture_pdf(self, driver):
+        width, height = driver.execute_script("return [window.innerWidth, window.innerHeight];")
+        scale = min(2.0, max(0.1, PAGE_WIDTH_IN * 96 / width))
+        paper_height = height * scale / 96
+        try:
+            data = driver.execute_cdp_cmd("Page.printToPDF", {
+                "paperWidth": PAGE_WIDTH_IN, "paperHeight": paper_height, "scale": scale,
+                "marginTop": 0, "marginBottom": 0, "marginLeft": 0, "marginRight": 0,
+                "printBackground": True, "preferCSSPageSize": False, "pageRanges": "1",
+            })["data"]
+        except Exception:
+            # Non-Chromium driver or CDP unavailable: WebDriver's print (sizes in cm)
+            options = PrintOptions()
+            options.page_width = PAGE_WIDTH_IN * 2.54
+            options.page_height = paper_height * 2.54
+            options.scale = scale
+            options.margin_top = options.margin_bottom = options.margin_left = options.margin_right = 0
+            options.background = True
+            options.page_ranges = ["1"]
+            data = driver.print_page(options)
+        return base64.b64decode(data)
+
+    def capture_to(self, driver, assembler, name, metrics, slide=None):
+        started = time.perf_counter()
+        data = self.capture_pdf(driver) if self.capture == "vector" else self.capture_png(driver)
+        elapsed = time.perf_counter() - started
+        metrics.add_time("capture", elapsed)
+        metrics.page(name, capture=round(elapsed, 4))
+        metrics.count("screenshots")
+        assembler.submit(name, data, slide)
+
+    # `slide` names the slide when page_num doesn't identify it (see
+    # capture_sequential); frames of one slide may replace each other in
+    # perceptual dedup
+    def capture_screenshots_with_tabs(self, driver, page_num, assembler, metrics=None, slide=None):
+        metrics = metrics or JobMetrics(self.cache_id)
+        screenshots = []
+
+        # Capture full page screenshot
+        page_shot = f"page_{page_num:02d}_full.png"
+        self.capture_to(driver, assembler, page_shot, metrics, slide)
+        screenshots.append(page_shot)
+
+        # One script call finds the visible tabs and their labels, instead of
+        # find_elements/is_displayed/text round trips per element
+        with metrics.stage("tab_discovery"):
+            try:
+                all_tabs = find_tabs(driver)
+            except Exception:
+                all_tabs = []
+        metrics.count("tabs", len(all_tabs))
+
+        # Click each tab and capture screenshot; the click and the settle wait
+        # share one call, and the capture goes straight to the assembler queue
+        for i, (tab, label) in enumerate(all_tabs):
+            try:
+                with metrics.stage("tab_clicks"):
+                    self.settle(driver, tab, TAB_EVENTS, self.tab_settle_ms)
+                tab_name = label.replace(" ", "_").replace("/", "_") or f"{i + 1}"
+                filename = f"page_{page_num:02d}_tab_{i + 1}_{tab_name}.png"
+                self.capture_to(driver, assembler, filename, metrics, slide)
+                screenshots.append(filename)
+            except Exception:
+                continue
+
+        return screenshots
+
+    # Clicks (optionally) and waits until the page has actually rendered,
+    # instead of sleeping a fixed amount of time
+    def settle(self, driver, target, events, timeout_ms, slide_to=None):
+        try:
+            return click_and_settle(driver, target, events, timeout_ms, slide_to)
+        except Exception:
+            if target is not None:
+                driver.execute_script("arguments[0].click();", target)
+            elif slide_to is not None:
+                driver.execute_script(
+                    "const s = arguments[0]; s[2] === null ? Reveal.slide(s[0], s[1]) : Reveal.slide(s[0], s[1], s[2]);",
+                    slide_to)
+            return None
+
+    # Fallback for documents without the Reveal.js API: press the "next"
+    # control and capture until it disappears
+    def click_next_page(self, driver):
+        try:
+            next_btn = driver.find_element(By.XPATH, "/html/body/div[3]/aside/button[2]/div")
+            if next_btn.is_displayed():
+                self.settle(driver, next_btn, SLIDE_EVENTS, self.slide_settle_ms)
+                return True
+        except NoSuchElementException:
+            pass
+        return False
+
+    # One slide into `sink`: from the slide cache when its fingerprint was
+    # seen before, otherwise navigated to and captured (and then cached)
+    def render_slide(self, driver, navigator, number, sink, metrics, fingerprints=None):
+        key = fingerprints[number] if fingerprints else None
+        frames = get_slide_cache().get(key) if key else None
+        if frames is not None:
+            for suffix, data in frames:
+                sink.submit(f"page_{number + 1:02d}_{suffix}", data)
+            metrics.count("slides_reused")
+            return
+        with metrics.stage("slide_advance"):
+            navigator.goto(number)
+        if key is None:
+            self.capture_screenshots_with_tabs(driver, number + 1, sink, metrics)
+            return
+        recorder = RecordingSink(sink, number + 1)
+        self.capture_screenshots_with_tabs(driver, number + 1, recorder, metrics)
+        get_slide_cache().put(key, recorder.frames)
+        metrics.count("slides_rendered")
+
+    # Visits every slide of a Reveal.js deck by index, fragments fully shown
+    def capture_slides(self, driver, navigator, assembler, metrics, progress_callback=None, fingerprints=None):
+        for number in range(len(navigator)):
+            self.render_slide(driver, navigator, number, assembler, metrics, fingerprints)
+            if progress_callback:
+                progress_callback(number + 1)
+        return len(navigator)
+
+    # Renders one deck with up to `shards` browsers: this driver plus helpers
+    # leased from the pool, each opening the deck and taking slides from a
+    # shared queue. Helpers are only used if the pool has a browser to spare
+    # right now and the memory governor admits another one, so busy servers
+    # degrade to a single browser instead of waiting. Frames are merged back into slide order before assembly.
+    def capture_sharded(self, driver, url, navigator, shards, assembler, metrics, progress_callback=None,
+                        fingerprints=None):
+        # Helpers may run at most two slides per browser ahead of the next
+        # slide to be written, which bounds the frames held for reordering
+        slides = SlideQueue(len(navigator), window=shards * 2)
+        sequencer = FrameSequencer(assembler)
+        governor = get_memory_governor()
+
+        errors = []  # Failures that end the whole job, raised by this thread
+
+        def work(drv, nav):
+            while True:
+                number = slides.next()
+                if number is None:
+                    return
+                try:
+                    self.render_slide(drv, nav, number, sequencer.slide(number), metrics, fingerprints)
+                except Exception:
+                    # Another browser picks the slide up again
+                    sequencer.discard(number)
+                    slides.retry(number)
+                    raise
+                try:
+                    try:
+                        completed = sequencer.finish(number)
+                    finally:
+                        slides.done(number)
+                    if progress_callback:
+                        progress_callback(completed)
+                except Exception as e:
+                    # The assembler failed or the job was cancelled: no browser
+                    # can go on, and a helper's error must reach this thread
+                    errors.append(e)
+                    slides.cancel()
+                    raise
+
+        def helper():
+            # An extra browser costs as much memory as another conversion
+            if not governor.try_acquire():
+                metrics.count("shards_skipped_memory")
+                return
+            try:
+                lease = get_browser_pool().driver(timeout=0)
+                with lease as drv:
+                    metrics.add_time("browser_launch", lease.acquire_seconds)
+                    if lease.launched:
+                        metrics.count("browser_launches")
+                    drv.set_script_timeout(max(self.slide_settle_ms, self.tab_settle_ms) / 1000 + 10)
+                    drv.get(url)
+                    self.settle(drv, None, [], self.slide_settle_ms)
+                    self.prepare_capture(drv)
+                    nav = RevealNavigator.detect(drv, lambda slide_to: self.settle(
+                        drv, None, SLIDE_EVENTS, self.slide_settle_ms, slide_to))
+                    if nav is None or nav.slides != navigator.slides:
+                        return
+                    metrics.count("shards")
+                    work(drv, nav)
+            except TimeoutError:
+                pass  # No browser to spare
+            except Exception:
+                metrics.count("shard_failures")
+            finally:
+                governor.release()
+
+        helpers = [threading.Thread(target=helper, name=f"shard-{i}", daemon=True) for i in range(1, shards)]
+        for thread in helpers:
+            thread.start()
+        metrics.count("shards")
+        try:
+            work(driver, navigator)
+        except Exception:
+            slides.cancel()
+            raise
+        finally:
+            for thread in helpers:
+                thread.join()
+        if errors:
+            raise errors[0]
+        return len(navigator)
+
+    # Per-slide fingerprints for the slide cache, or None if the deck can't be
+    # fingerprinted (or the slide list doesn't match the navigator's)
+    def fingerprint_slides(self, driver, navigator, mirrored):
+        server = get_asset_server() if mirrored else None
+        salt = {"method": self.cache_id, "viewport": self.render_options()["viewport"],
+                "navigation": self.navigation, "capture": self.capture}
+        fingerprints = slide_fingerprints(driver, salt, server.prefix if server else None)
+        if fingerprints is None or len(fingerprints) != len(navigator):
+            return None
+        return fingerprints
+
+    # "h.v" of the Reveal.js slide on screen, shared by its fragment steps;
+    # None for other documents
+    def current_slide(self, driver):
+        try:
+            return driver.execute_script(
+                "const R = window.Reveal; if (!R || typeof R.getIndices !== 'function') return null;"
+                "const i = R.getIndices(); return `${i.h}.${i.v || 0}`;")
+        except Exception:
+            return None
+
+    def capture_sequential(self, driver, assembler, metrics, progress_callback=None):
+        total_pages = 0
+        while True:
+            total_pages += 1
+            self.capture_screenshots_with_tabs(driver, total_pages, assembler, metrics, self.current_slide(driver))
+
+            if progress_callback:
+                progress_callback(total_pages)
+
+            with metrics.stage("slide_advance"):
+                advanced = self.click_next_page(driver)
+            if not advanced:
+                return total_pages
+
+    # Points the document's CDN assets at the local asset mirror (see
+    # asset_cache.py); Selenium cannot intercept requests itself. The
+    # rewritten copy goes into the job's own output_dir, so jobs on inputs
+    # with the same name never share it; a <base> pointing at the original's
+    # directory keeps relative paths working.
+    # Returns (path to load, temporary copy to delete or None).
+    def mirror_assets(self, file_path, output_dir):
+        server = get_asset_server()
+        if server is None:
+            return file_path, None
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        rewritten = server.rewrite_html(html)
+        if rewritten == html:
+            return file_path, None
+        directory, name = os.path.split(os.path.abspath(file_path))
+        rewritten = with_base(rewritten, pathlib.Path(directory).as_uri() + "/")
+        mirror_path = os.path.join(output_dir, f".{name}.assets.html")
+        try:
+            with open(mirror_path, "w", encoding="utf-8") as f:
+                f.write(rewritten)
+        except OSError:
+            return file_path, None
+        return mirror_path, mirror_path
+
+    def process_file(self, file_path, output_dir, progress_callback=None, metrics=None):
+        metrics = metrics or JobMetrics(self.cache_id)
+        os.makedirs(output_dir, exist_ok=True)
+        with metrics.stage("asset_rewrite"):
+            page_path, mirror_copy = self.mirror_assets(file_path, output_dir)
+        url = "file://" + os.path.abspath(page_path)
+        pdf_path = os.path.join(output_dir, "output.pdf")
+
+        # Screenshots flow from the browser into the PDF writer through an
+        # in-process queue; PNG files are only written in debug mode
+        if self.capture == "vector":
+            assembler = VectorAssembler(
+                pdf_path,
+                debug_dir=output_dir if self.save_screenshots else None,
+                metrics=metrics,
+                dedup=FrameDeduplicator("off" if self.dedup_mode == "off" else "exact")
+            )
+        else:
+            assembler = PdfAssembler(
+                pdf_path, profile=self.profile,
+                debug_dir=output_dir if self.save_screenshots else None,
+                metrics=metrics,
+                dedup=FrameDeduplicator(self.dedup_mode, self.dedup_threshold)
+            )
+
+        try:
+            # Browsers come from a shared warm pool instead of being launched per file
+            lease = get_browser_pool().driver()
+            with lease as driver:
+                metrics.add_time("browser_launch", lease.acquire_seconds)
+                if lease.launched:
+                    metrics.count("browser_launches")
+
+                driver.set_script_timeout(max(self.slide_settle_ms, self.tab_settle_ms) / 1000 + 10)
+                with metrics.stage("navigation"):
+                    driver.get(url)
+                with metrics.stage("page_settle"):
+                    self.settle(driver, None, [], self.slide_settle_ms)
+                self.prepare_capture(driver)
+
+                navigator = None
+                if self.navigation == "reveal":
+                    with metrics.stage("slide_index"):
+                        navigator = RevealNavigator.detect(driver, lambda slide_to: self.settle(
+                            driver, None, SLIDE_EVENTS, self.slide_settle_ms, slide_to))
+                if navigator is not None:
+                    metrics.count("reveal_navigation")
+                    fingerprints = None
+                    if self.incremental:
+                        with metrics.stage("fingerprint"):
+                            fingerprints = self.fingerprint_slides(driver, navigator, page_path != file_path)
+                    # Only slides that need a browser are worth sharding
+                    to_render = len(navigator) - sum(
+                        1 for key in fingerprints or [] if get_slide_cache().contains(key))
+                    shards = plan_shards(to_render, self.shards, self.shard_min_slides)
+                    if shards > 1:
+                        total_pages = self.capture_sharded(driver, url, navigator, shards, assembler, metrics,
+                                                           progress_callback, fingerprints)
+                    else:
+                        total_pages = self.capture_slides(driver, navigator, assembler, metrics, progress_callback,
+                                                          fingerprints)
+                else:
+                    total_pages = self.capture_sequential(driver, assembler, metrics, progress_callback)
+
+            with metrics.stage("pdf_write"):
+                page_count = assembler.close()
+        except Exception as e:
+            assembler.abort()
+            raise ConversionError(f"Error creating PDF: {str(e)}")
+        finally:
+            if mirror_copy:
+                try:
+                    os.remove(mirror_copy)
+                except OSError:
+                    pass
+
+        if self.incremental:
+            get_slide_cache().evict()
+        metrics.count("slides", total_pages)
+        metrics.count("pdf_pages", page_count)
+        return pdf_path if page_count else None, total_pages
+
+
+# Method 2: Puppeteer-based PDF generation (FIXED VERSION)
+class PuppeteerMethod:
+    def __init__(self):
+        self.name = "Method 2: Puppeteer PDF Generation"
+        self.cache_id = "puppeteer"
+        self.description = """
+        **Features:**
+        - Uses Puppeteer (headless Chrome) via Node.js
+        - Direct PDF generation with native browser rendering
+        - Advanced content scaling and optimization
+        - Handles lazy-loaded images and MathJax
+        - A3 landscape format with optimized margins
+
+        **Advantages:**
+        - Smaller file sizes (native PDF)
+        - Better text quality and searchability
+        - Faster processing for large documents
+        - Superior handling of web fonts and CSS
+        - Better print layout optimization
+
+        **Disadvantages:**
+        - Requires Node.js and Puppeteer
+        - Less visual debugging capability
+        - May not handle some complex interactions
+        - Single PDF output (no tab separation)
+        """
+
+    def render_options(self):
+        return {"viewport": "1587x1123", "format": "A3", "landscape": True, "margin": "8mm",
+                "assets": asset_settings()[1]}
+
+    def process_file(self, file_path, output_dir, progress_callback=None, metrics=None):
+        metrics = metrics or JobMetrics(self.cache_id)
+        os.makedirs(output_dir, exist_ok=True)
+
+        input_abs = os.path.abspath(file_path)
+        pdf_abs = os.path.abspath(os.path.join(output_dir, "output.pdf"))
+
+        # Rendering happens in the long-lived worker.js process, which keeps
+        # Chromium open between files (see render.js for the render steps).
+        # The callback is polled while it runs so a cancel it raises stops
+        # the render instead of waiting for it to finish.
+        poll = (lambda: progress_callback(0)) if progress_callback else None
+        try:
+            result, stages = get_puppeteer_worker().render(input_abs, pdf_abs, timeout=300, poll=poll)
+
+            if progress_callback:
+                progress_callback(1)
+
+        except TimeoutError:
+            raise ConversionError(
+                "Puppeteer process timed out after 5 minutes. The HTML file might be too complex or contain issues.")
+        except Exception as e:
+            raise ConversionError(f"Error running Puppeteer: {str(e)}")
+
+        # Stage timings measured inside worker.js, in milliseconds
+        for stage, ms in (result.get("timings") or {}).items():
+            metrics.add_time(stage, ms / 1000.0)
+        for name, value in (result.get("counters") or {}).items():
+            metrics.count(name, value)
+
+        if result.get("status") == "ok" and os.path.exists(pdf_abs):
+            return pdf_abs, 1
+        raise ConversionError(
+            f"Puppeteer failed: {result.get('error')}\n\nStages:\n" + "\n".join(stages))
+
+
+METHODS = {
+    "selenium": SeleniumMethod,
+    "puppeteer": PuppeteerMethod,
+}
+
+
+# Extra keyword options go to the method's constructor, e.g. profile="screen"
+def get_method(name, **options):
+    try:
+        return METHODS[name.lower()](**options)
+    except KeyError:
+        raise ValueError(f"Unknown method '{name}', expected one of: {', '.join(METHODS)}")
+
+
+# Job with its own working directory in `work_root` (a path, or None for the
+# shared workspace, see workspace.py)
+def make_job(input_path, work_root=None, method=None):
+    workspace = get_workspace() if work_root is None else Workspace(work_root)
+    filename_base = os.path.splitext(os.path.basename(input_path))[0]
+    output_dir = workspace.job_dir(filename_base)
+    return ConversionJob(os.path.basename(input_path), input_path, output_dir, method=method)
+
+
+# Converts several files and yields a ConversionResult for each as it
+# finishes. `method` is a name ("selenium"/"puppeteer") or a method object.
+# Working directories are marked finished as results come out, so the
+# workspace may expire them later.
+def convert_files(input_paths, method="selenium", max_workers=None, use_cache=True, work_root=None):
+    if isinstance(method, str):
+        method = get_method(method)
+    workspace = get_workspace() if work_root is None else Workspace(work_root)
+    jobs = [make_job(path, work_root) for path in input_paths]
+    scheduler = ConversionScheduler(method, max_workers=max_workers,
+                                    cache=get_conversion_cache() if use_cache else None)
+    for event in scheduler.run(jobs):
+        if event[0] == "done":
+            workspace.finish(event[1].job.output_dir)
+            yield event[1]
+
+
+# Converts one file and copies the PDF to output_path. Raises ConversionError
+# on failure and returns the ConversionResult otherwise.
+def convert_file(input_path, output_path, method="selenium", use_cache=True, work_root=None):
+    result, = convert_files([input_path], method, max_workers=1, use_cache=use_cache, work_root=work_root)
+    if not result.ok:
+        raise ConversionError(result.error or f"Failed to convert {input_path}")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    shutil.copyfile(result.pdf_path, output_path)
+    return result
@@ -0,0 +1,97 @@
+import os
+import re
+import hashlib
+from PIL import Image
+
+
+# Drops screenshots that repeat the previous frame. Slides without tabs, or
+# whose first tab is already active, produce a "full" shot that is pixel
+# identical to the first tab shot; fragment-only advances produce frames that
+# differ in a few pixels.
+#
+# mode "exact" drops frames whose PNG bytes match the previous frame.
+# mode "perceptual" additionally compares a 256-bit difference hash and a
+# grayscale thumbnail: when the Hamming distance to the previous frame is
+# <= threshold and the thumbnails barely differ, the new frame
+# *replaces* the previous one, since the later state (e.g. after a fragment
+# appears) contains the earlier one. That only holds within one fragment
+# sequence, so replacement needs both frames in the same group (slide and
+# tab, see frame_group); two different slides can look alike at this size
+# ("Accuracy: 0.91" vs "0.97") and must both be kept.
+# mode "off" keeps everything.
+_FRAME_NAME_RE = re.compile(r"^page_(\d+)_(full|tab_\d+)")
+
+
+# Group of a frame for perceptual dedup: its slide and whether it is the full
+# shot or which tab. `slide` overrides the page number from the name, for
+# captures that step through fragments (each step gets its own page number).
+def frame_group(name, slide=None):
+    m = _FRAME_NAME_RE.match(name)
+    if not m:
+        return (slide, name)
+    return (m.group(1) if slide is None else slide, m.group(2))
+
+
+class FrameDeduplicator:
+    MODES = ("off", "exact", "perceptual")
+    # Mean absolute difference (0-255) of the grayscale thumbnails
+    MAX_MEAN_DIFFERENCE = 2.0
+
+    def __init__(self, mode="exact", threshold=4, hash_size=16):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown dedup mode '{mode}', expected one of: {', '.join(self.MODES)}")
+        self.mode = mode
+        self.threshold = threshold
+        self.hash_size = hash_size
+        self.dropped = 0
+        self.replaced = 0
+        self._last_digest = None
+        self._last_hash = None
+        self._last_group = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            mode=os.environ.get("QUARTO2PDF_DEDUP", "exact"),
+            threshold=int(os.environ.get("QUARTO2PDF_DEDUP_THRESHOLD", "4")),
+        )
+
+    def is_exact_duplicate(self, data):
+        if self.mode == "off":
+            return False
+        digest = hashlib.sha1(data).digest()
+        if digest == self._last_digest:
+            self.dropped += 1
+            return True
+        self._last_digest = digest
+        return False
+
+    # 256-bit difference hash plus the grayscale thumbnail it came from. The
+    # hash captures structure; the thumbnail catches frames with the same
+    # structure but different colours or brightness (e.g. two flat slides).
+    def fingerprint(self, image):
+        size = self.hash_size
+        small = image.convert("L").resize((size + 1, size), Image.BILINEAR)
+        pixels = list(small.getdata())
+        bits = 0
+        for row in range(size):
+            offset = row * (size + 1)
+            for col in range(size):
+                bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+        return bits, pixels
+
+    # True when `image` should replace the previous frame of the same group
+    def is_near_duplicate(self, image, group=None):
+        if self.mode != "perceptual":
+            return False
+        value = self.fingerprint(image)
+        previous, self._last_hash = self._last_hash, value
+        same_group, self._last_group = group == self._last_group, group
+        if previous is None or not same_group:
+            return False
+        distance = bin(previous[0] ^ value[0]).count("1")
+        brightness = sum(abs(a - b) for a, b in zip(previous[1], value[1])) / len(value[1])
+        if distance <= self.threshold and brightness <= self.MAX_MEAN_DIFFERENCE:
+            self.replaced += 1
+            return True
+        return False
@@ -0,0 +1,265 @@
+import os
+import hmac
+import time
+import hashlib
+import zipfile
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from workspace import get_workspace
+
+
+# Finished PDFs are served straight from disk by a small HTTP server instead
+# of through st.download_button, which reads the whole file into the session
+# and keeps it there for every result on the page. The UIs only hold links:
+#
+#   /f/<token>/<name>.pdf   one PDF, with Range support (resumed and parallel
+#                           downloads, in-browser viewers)
+#   /z/<token>/<name>.zip   every PDF of a batch in one ZIP, built while it is
+#                           sent, so no archive ever exists in memory or on disk
+#
+# Tokens are HMACs of the files they grant (with a per-process secret), so
+# only files the app handed out can be fetched, and reruns that link the same
+# files reuse the same entry. Entries expire after `ttl` seconds.
+
+_CHUNK = 256 * 1024
+
+_server = None
+_server_lock = threading.Lock()
+
+
+class DownloadRegistry:
+    def __init__(self, ttl=24 * 3600):
+        self.ttl = ttl
+        self._secret = os.urandom(32)
+        self._entries = {}  # token -> (expires, [(path, name)])
+        self._lock = threading.Lock()
+
+    def register(self, files):
+        files = [(os.path.abspath(path), name) for path, name in files]
+        key = "\0".join(f"{path}\0{name}" for path, name in files).encode("utf-8")
+        token = hmac.new(self._secret, key, hashlib.sha256).hexdigest()[:32]
+        now = time.time()
+        with self._lock:
+            for stale in [t for t, (expires, _) in self._entries.items() if expires < now]:
+                del self._entries[stale]
+            self._entries[token] = (now + self.ttl, files)
+        return token
+
+    def lookup(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+
+# (start, end) inclusive for a single "bytes=" range, None to send the whole
+# file, or "invalid" when the range can't be satisfied
+def parse_range(header, size):
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None  # Absent, another unit or several ranges: whole file
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                return "invalid"
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+def _disposition(name):
+    fallback = name.encode("ascii", "replace").decode("ascii").replace('"', "_").replace("?", "_")
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{urllib.parse.quote(name)}"
+
+
+# ZIP member names, made unique ("deck.pdf", "deck (2).pdf", ...)
+def _unique_names(names):
+    seen = set()
+    unique = []
+    for name in names:
+        base, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate in seen:
+            n += 1
+            candidate = f"{base} ({n}){ext}"
+        seen.add(candidate)
+        unique.append(candidate)
+    return unique
+
+
+# Workspace directories are evicted least recently used first; a download
+# counts as a use
+def _touch(path):
+    workspace = get_workspace()
+    directory = os.path.dirname(path)
+    if os.path.dirname(directory) == os.path.abspath(workspace.jobs_root):
+        workspace.touch(directory)
+
+
+class _DownloadHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head):
+        parts = urllib.parse.urlparse(self.path).path.split("/")
+        if len(parts) != 4 or parts[1] not in ("f", "z"):
+            self.send_error(404)
+            return
+        files = self.registry.lookup(parts[2])
+        if files is None:
+            self.send_error(404, "Link expired")
+            return
+        if parts[1] == "f":
+            self._send_file(files[0], head)
+        else:
+            self._send_zip(files, urllib.parse.unquote(parts[3]), head)
+
+    def _send_file(self, entry, head):
+        path, name = entry
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(410, "File no longer available")
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            etag = f'"{size:x}-{int(stat.st_mtime):x}"'
+            byte_range = parse_range(self.headers.get("Range"), size)
+            if_range = self.headers.get("If-Range")
+            if if_range and if_range != etag:
+                byte_range = None  # File changed since the client's partial copy
+            if byte_range == "invalid":
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            start, end = byte_range or (0, size - 1)
+            self.send_response(206 if byte_range else 200)
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Content-Disposition", _disposition(name))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+            self.end_headers()
+            if head:
+                return
+            _touch(path)
+            f.seek(start)
+            remaining = end - start + 1
+            try:
+                while remaining > 0:
+                    chunk = f.read(min(_CHUNK, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client went away
+
+    def _send_zip(self, files, name, head):
+        files = [(path, member) for (path, _), member in zip(files, _unique_names([n for _, n in files]))
+                 if os.path.exists(path)]
+        if not files:
+            self.send_error(410, "Files no longer available")
+            return
+        # The size isn't known up front, so the body ends when the connection
+        # closes (HTTP/1.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Disposition", _disposition(name))
+        self.send_header("Accept-Ranges", "none")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        if head:
+            return
+        try:
+            # Stored, not deflated: PDFs hardly compress. zipfile writes data
+            # descriptors since the socket isn't seekable.
+            with zipfile.ZipFile(self.wfile, "w", zipfile.ZIP_STORED) as archive:
+                for path, member in files:
+                    try:
+                        src = open(path, "rb")
+                    except OSError:
+                        continue  # Expired while the archive was being sent
+                    with src, archive.open(member, "w", force_zip64=True) as dest:
+                        for chunk in iter(lambda: src.read(_CHUNK), b""):
+                            dest.write(chunk)
+                    _touch(path)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DownloadServer:
+    def __init__(self, port, host="0.0.0.0", base_url=None, ttl=24 * 3600):
+        self.registry = DownloadRegistry(ttl)
+        handler = type("DownloadHandler", (_DownloadHandler,), {"registry": self.registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.base_url = base_url.rstrip("/") if base_url else None
+        threading.Thread(target=self.httpd.serve_forever, name="download-server", daemon=True).start()
+
+    # Base URL as seen by the browser: QUARTO2PDF_DOWNLOAD_URL if set (e.g.
+    # behind a reverse proxy), else the host the page was loaded from
+    def _base(self, host=None):
+        if self.base_url:
+            return self.base_url
+        hostname = urllib.parse.urlsplit(f"//{host}").hostname if host else None
+        if hostname and ":" in hostname:
+            hostname = f"[{hostname}]"  # IPv6 literal
+        return f"http://{hostname or 'localhost'}:{self.port}"
+
+    def file_url(self, path, name, host=None):
+        token = self.registry.register([(path, name)])
+        return f"{self._base(host)}/f/{token}/{urllib.parse.quote(name)}"
+
+    # One ZIP with every (path, name) in `files`
+    def zip_url(self, files, name, host=None):
+        token = self.registry.register(files)
+        return f"{self._base(host)}/z/{token}/{urllib.parse.quote(name)}"
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+# Starts the download server on QUARTO2PDF_DOWNLOAD_PORT on first call; safe
+# to call on every Streamlit rerun. None when disabled (port 0) or when the
+# port is taken, in which case the UIs fall back to st.download_button.
+def get_download_server():
+    global _server
+    with _server_lock:
+        if _server is None:
+            port = int(os.environ.get("QUARTO2PDF_DOWNLOAD_PORT", "8505"))
+            if not port:
+                return None
+            try:
+                _server = DownloadServer(
+                    port,
+                    base_url=os.environ.get("QUARTO2PDF_DOWNLOAD_URL") or None,
+                    ttl=float(os.environ.get("QUARTO2PDF_DOWNLOAD_TTL_HOURS", "24")) * 3600,
+                )
+            except OSError:
+                return None
+        return _server
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import hashlib
+import zipfile
+import threading
+import urllib.parse
+import urllib.request
+from conversion_cache import TOOL_VERSION, _atomic_write, hash_file
+
+
+# Incremental re-conversion for the Selenium method. Every Reveal.js slide
+# gets a fingerprint from its own DOM plus the files it references (images,
+# backgrounds) and the document-wide parts that affect every slide (<head>,
+# stylesheets, scripts). The raw frames captured for a slide are kept under
+# that fingerprint, so when an edited deck comes back only the slides whose
+# fingerprint changed are navigated to and captured again; the others are
+# fed to the PdfAssembler straight from the cache. Opt-in
+# (QUARTO2PDF_INCREMENTAL=1): cached frames go through disk, while a normal
+# conversion keeps them in memory from capture to PDF.
+
+# Hashes in the page so large inline content (data: URIs, SVG) never crosses
+# the WebDriver connection. Reveal's navigation state (present/past/future,
+# display, aria-hidden) is stripped so the same slide hashes the same way
+# wherever the deck happens to be, and the asset mirror's address
+# (arguments[0], its port differs per process) is removed before hashing.
+# Frames also show things outside the slide itself: its position ("3 / 20",
+# the progress bar) and the deck chrome around .slides (footer, logo), so the
+# index, the total and the normalized chrome are part of the result too.
+# Returns {head, chrome, total, globals, slides: [{hash, index, assets}]} in
+# Reveal.getSlides() order, or null without Reveal.js.
+SLIDE_FINGERPRINT_JS = r"""
+const mirror = arguments[0];
+const done = arguments[arguments.length - 1];
+const R = window.Reveal;
+if (!R || typeof R.getSlides !== "function") { done(null); return; }
+
+const cyrb53 = (str, seed = 0) => {
+  let h1 = 0xdeadbeef ^ seed, h2 = 0x41c6ce57 ^ seed;
+  for (let i = 0; i < str.length; i++) {
+    const ch = str.charCodeAt(i);
+    h1 = Math.imul(h1 ^ ch, 2654435761);
+    h2 = Math.imul(h2 ^ ch, 1597334677);
+  }
+  h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+  h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+  return (h2 >>> 0).toString(16).padStart(8, "0") + (h1 >>> 0).toString(16).padStart(8, "0");
+};
+const digest = async text => {
+  if (mirror) text = text.split(mirror).join("");
+  if (window.crypto && crypto.subtle) {
+    const buf = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+    return Array.from(new Uint8Array(buf)).map(b => b.toString(16).padStart(2, "0")).join("");
+  }
+  return cyrb53(text) + cyrb53(text, 1);
+};
+
+const STATE_CLASSES = ["present", "past", "future", "stack", "visible", "current-fragment"];
+const normalized = slide => {
+  const clone = slide.cloneNode(true);
+  [clone, ...clone.querySelectorAll("section, .fragment")].forEach(el => {
+    STATE_CLASSES.forEach(c => el.classList.remove(c));
+    ["style", "hidden", "aria-hidden", "data-previous-indexv"].forEach(a => el.removeAttribute(a));
+  });
+  return clone.outerHTML;
+};
+
+// Everything in .reveal except the slides and the parts Reveal redraws per
+// slide (their state follows from the index and total)
+const CHROME_SKIP = ".slides, .backgrounds, .progress, .slide-number, .controls, .pause-overlay, .speaker-notes, [aria-live]";
+const chrome = () => {
+  const reveal = document.querySelector(".reveal");
+  if (!reveal) return "";
+  const clone = reveal.cloneNode(true);
+  clone.querySelectorAll(CHROME_SKIP).forEach(el => el.remove());
+  [clone, ...clone.querySelectorAll("*")].forEach(el => {
+    ["style", "hidden", "aria-hidden"].forEach(a => el.removeAttribute(a));
+  });
+  clone.removeAttribute("class");
+  return clone.outerHTML;
+};
+
+const indexOf = slide => {
+  try {
+    const i = R.getIndices(slide);
+    return [i.h || 0, i.v || 0];
+  } catch (e) {
+    return null;
+  }
+};
+
+const urlsIn = root => {
+  const urls = [];
+  root.querySelectorAll("img[src], source[src], video[src], audio[src], iframe[src], embed[src]")
+    .forEach(el => urls.push(el.src));
+  root.querySelectorAll("video[poster]").forEach(el => urls.push(el.poster));
+  root.querySelectorAll("[data-src], [data-background-image], [data-background-video], [data-background-iframe]")
+    .forEach(el => ["data-src", "data-background-image", "data-background-video", "data-background-iframe"]
+      .forEach(a => el.hasAttribute(a) && urls.push(new URL(el.getAttribute(a), document.baseURI).href)));
+  root.querySelectorAll("[style*='url(']").forEach(el => {
+    for (const m of el.getAttribute("style").matchAll(/url\(\s*["']?([^"')]+)/g)) {
+      urls.push(new URL(m[1], document.baseURI).href);
+    }
+  });
+  return Array.from(new Set(urls.filter(u => u && !u.startsWith("data:")))).sort();
+};
+const unmirrored = url => mirror && url.startsWith(mirror) ? url.slice(mirror.length) : url;
+
+(async () => {
+  const globals = Array.from(document.querySelectorAll("link[rel~='stylesheet'][href], script[src]"))
+    .map(el => el.href || el.src).filter(u => u && !u.startsWith("data:")).map(unmirrored);
+  const inline = Array.from(document.querySelectorAll("style, script:not([src])")).map(el => el.textContent).join("\n");
+  const slides = [];
+  for (const slide of R.getSlides()) {
+    slides.push({ hash: await digest(normalized(slide)), index: indexOf(slide), assets: urlsIn(slide).map(unmirrored) });
+  }
+  const total = typeof R.getTotalSlides === "function" ? R.getTotalSlides() : slides.length;
+  // The <base> added to mirrored copies names the upload's directory
+  const head = document.head.cloneNode(true);
+  head.querySelectorAll("base[data-q2p-base]").forEach(el => el.remove());
+  done({ head: await digest(head.outerHTML + inline), chrome: await digest(chrome()), total: total,
+         globals: globals, slides: slides });
+})().catch(e => done(null));
+"""
+
+
+def incremental_settings():
+    return (
+        os.environ.get("QUARTO2PDF_INCREMENTAL", "0") == "1",
+        os.environ.get("QUARTO2PDF_SLIDE_CACHE_DIR", os.path.join("output", "slide-cache")),
+        int(os.environ.get("QUARTO2PDF_SLIDE_CACHE_MAX_MB", "2048")) * 1024 * 1024,
+    )
+
+
+# Identity of a referenced file: local files by content alone (uploads land
+# in a different directory every time), remote ones by URL (the asset cache
+# keeps those stable anyway)
+def _asset_digest(url, memo):
+    if url in memo:
+        return memo[url]
+    value = url
+    if url.startswith("file://"):
+        path = urllib.request.url2pathname(urllib.parse.urlparse(url).path)
+        try:
+            value = "file:" + hash_file(path)
+        except OSError:
+            value = "missing:" + os.path.basename(path)
+    memo[url] = value
+    return value
+
+
+# One fingerprint per slide, in Reveal.getSlides() order, or None when the
+# page isn't a Reveal.js deck. `salt` covers everything outside the document
+# that changes captures (viewport, browser); `mirror` is the asset server
+# prefix, if the page was rewritten to use it.
+def slide_fingerprints(driver, salt, mirror=None):
+    try:
+        data = driver.execute_async_script(SLIDE_FINGERPRINT_JS, mirror)
+    except Exception:
+        return None
+    if not data or not data.get("slides"):
+        return None
+
+    memo = {}
+    shared = hashlib.sha256()
+    shared.update(json.dumps({"salt": salt, "version": TOOL_VERSION, "head": data["head"],
+                              "chrome": data.get("chrome"), "total": data.get("total")}, sort_keys=True).encode())
+    for url in data["globals"]:
+        shared.update(f"{_asset_digest(url, memo)}\0".encode())
+    shared = shared.hexdigest()
+
+    fingerprints = []
+    for slide in data["slides"]:
+        digest = hashlib.sha256(f"{shared}\0{slide['hash']}\0{json.dumps(slide.get('index'))}\0".encode())
+        for url in slide["assets"]:
+            digest.update(f"{_asset_digest(url, memo)}\0".encode())
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+
+# Frames captured for one slide, stored as an uncompressed zip per
+# fingerprint (PNG doesn't compress further). Written atomically; the least
+# recently used entries are evicted past max_bytes, like the PDF cache.
+class SlideCache:
+    def __init__(self, root, max_bytes=2048 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.zip")
+
+    def contains(self, key):
+        return os.path.exists(self._path(key))
+
+    # [(suffix, png bytes)] or None
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with zipfile.ZipFile(path) as archive:
+                frames = [(name, archive.read(name)) for name in archive.namelist()]
+            now = time.time()
+            os.utime(path, (now, now))
+        except (OSError, zipfile.BadZipFile, KeyError):
+            return None
+        return frames
+
+    def put(self, key, frames):
+        def write(out):
+            with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as archive:
+                for name, data in frames:
+                    archive.writestr(name, data)
+        _atomic_write(self._path(key), write)
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith(".zip"):
+                    continue
+                path = os.path.join(self.root, name)
+                try:
+                    entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+                except OSError:
+                    continue
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+
+# Passes frames through to the real sink and keeps a copy for the cache.
+# Names are stored without their "page_NN_" prefix, since an unchanged slide
+# may sit at a different position next time.
+class RecordingSink:
+    def __init__(self, sink, page_num):
+        self.sink = sink
+        self.prefix = f"page_{page_num:02d}_"
+        self.frames = []
+
+    def submit(self, name, data, slide=None):
+        self.frames.append((name[len(self.prefix):] if name.startswith(self.prefix) else name, data))
+        self.sink.submit(name, data, slide)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_slide_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _, root, max_bytes = incremental_settings()
+            _cache = SlideCache(root, max_bytes)
+        return _cache
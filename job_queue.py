@@ -0,0 +1,358 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from converter import get_method
+from scheduler import ConversionJob, convert_job, default_concurrency
+from conversion_cache import get_conversion_cache
+from memory_governor import get_memory_governor
+from procstats import pid_alive
+from prescan import Prescan, get_throughput_model, scan_html
+from workspace import get_workspace
+
+
+# Persistent conversion queue backed by SQLite. The web UI submits jobs and
+# polls their status, so conversions keep running when a Streamlit session
+# reruns, refreshes or disconnects. Background worker threads take queued
+# jobs in a fair order: the next job comes from the session with the fewest
+# jobs already running, oldest first, so one user's large batch cannot starve
+# everyone else.
+#
+# Job states: queued -> running -> done | failed | cancelled. A queued job is
+# cancelled at once; a running one stops at its next progress report.
+# Finished jobs (and their output directories) are deleted after the
+# retention period, or earlier once the workspace evicts their files to stay
+# under its size cap (see workspace.py).
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    session TEXT,
+    name TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    method TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    pages INTEGER NOT NULL DEFAULT 0,
+    pdf_path TEXT,
+    error TEXT,
+    cached INTEGER NOT NULL DEFAULT 0,
+    metrics TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    est_slides INTEGER,
+    est_frames INTEGER,
+    est_seconds REAL,
+    progress_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session, created);
+"""
+
+# Columns added after the first release, for databases created before them
+_ADDED_COLUMNS = {
+    "est_slides": "INTEGER", "est_frames": "INTEGER", "est_seconds": "REAL", "progress_at": "REAL",
+}
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, db_path, workers=None, retention_seconds=24 * 3600, cache=None, workspace=None):
+        self.db_path = db_path
+        self.workers = workers or default_concurrency()
+        self.retention_seconds = retention_seconds
+        self.cache = cache
+        self.workspace = workspace
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            existing = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        if workspace is not None:
+            # Directories of jobs still waiting or running are never evicted
+            workspace.add_protector(self._unfinished_dirs)
+
+    # One short-lived connection per operation keeps threads (and several
+    # app processes sharing the file) out of each other's way
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Closing(db)
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"] or "{}")
+        job["metrics"] = json.loads(job["metrics"]) if job["metrics"] else None
+        job["cached"] = bool(job["cached"])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def submit(self, file_path, output_dir, name=None, method="selenium", options=None, session=None):
+        job_id = uuid.uuid4().hex
+        # Slide count and expected duration, for progress and ETAs
+        try:
+            estimate = scan_html(file_path)
+            slides, frames = estimate.slides, estimate.frames
+            seconds = get_throughput_model().predict(method, frames)
+        except (OSError, ValueError):
+            slides = frames = seconds = None
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, session, name, file_path, output_dir, method, options, status, created, "
+                "est_slides, est_frames, est_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, session, name or os.path.basename(file_path), file_path, output_dir,
+                 method, json.dumps(options or {}), QUEUED, time.time(), slides, frames, seconds))
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, session=None, ids=None):
+        query, args = "SELECT * FROM jobs", []
+        if ids is not None:
+            ids = list(ids)
+            if not ids:
+                return []
+            query += f" WHERE id IN ({','.join('?' * len(ids))})"
+            args = ids
+        elif session is not None:
+            query += " WHERE session = ?"
+            args = [session]
+        with self._connect() as db:
+            rows = db.execute(query + " ORDER BY created", args).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    # Seconds until a queued job is expected to start: the expected work of
+    # running jobs still left plus the queued jobs ahead of it, spread over
+    # the workers. None if the job isn't queued.
+    def estimated_wait(self, job_id, now=None):
+        now = now or time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT created FROM jobs WHERE id = ? AND status = ?", (job_id, QUEUED)).fetchone()
+            if row is None:
+                return None
+            ahead = db.execute(
+                "SELECT status, started, est_seconds FROM jobs WHERE (status = ? AND created < ?) OR status = ?",
+                (QUEUED, row["created"], RUNNING)).fetchall()
+        work = 0.0
+        for job in ahead:
+            expected = job["est_seconds"] or 0.0
+            if job["status"] == RUNNING and job["started"]:
+                expected = max(0.0, expected - (now - job["started"]))
+            work += expected
+        return work / max(1, self.workers)
+
+    # Position in the queue (1 = next) for a queued job, else None
+    def position(self, job_id):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created <= "
+                "(SELECT created FROM jobs WHERE id = ? AND status = ?)",
+                (QUEUED, job_id, QUEUED)).fetchone()
+        return row[0] or None
+
+    def cancel(self, job_id):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            cur = db.execute("UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                             (CANCELLED, time.time(), job_id, QUEUED))
+            dropped = cur.rowcount > 0
+            if not dropped:
+                cur = db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                                 (job_id, RUNNING))
+            db.execute("COMMIT")
+            cancelled = cur.rowcount > 0
+        if dropped and self.workspace is not None:
+            self.workspace.finish(self.get(job_id)["output_dir"])
+        return cancelled
+
+    def _unfinished_dirs(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT output_dir FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        return [row[0] for row in rows]
+
+    def _claim(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs AS j WHERE status = ? ORDER BY "
+                "(SELECT COUNT(*) FROM jobs AS r WHERE r.status = ? AND r.session IS j.session), created "
+                "LIMIT 1", (QUEUED, RUNNING)).fetchone()
+            if row is not None:
+                db.execute("UPDATE jobs SET status = ?, started = ?, worker_pid = ? WHERE id = ?",
+                           (RUNNING, time.time(), os.getpid(), row["id"]))
+            db.execute("COMMIT")
+        return self._to_dict(row) if row else None
+
+    def _progress(self, job_id, pages):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET pages = ?, progress_at = ? WHERE id = ?", (pages, time.time(), job_id))
+            row = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0]:
+            raise JobCancelled("cancelled")
+
+    def _run(self, job):
+        try:
+            method = get_method(job["method"], **job["options"])
+        except Exception as e:
+            self._finish(job["id"], FAILED, error=str(e))
+            return
+        estimate = None
+        if job["est_slides"] is not None:
+            estimate = Prescan(job["est_slides"], job["est_frames"] - job["est_slides"])
+        conversion = ConversionJob(job["name"], job["file_path"], job["output_dir"], estimate=estimate)
+        result = convert_job(conversion, method, self.cache, lambda pages: self._progress(job["id"], pages))
+
+        current = self.get(job["id"])
+        if result.ok:
+            status = DONE
+        elif current is None or current["cancel_requested"]:
+            status = CANCELLED
+        else:
+            status = FAILED
+        self._finish(job["id"], status, pdf_path=result.pdf_path if result.ok else None,
+                     pages=result.pages, error=None if result.ok else result.error,
+                     cached=result.cached, metrics=result.metrics)
+        if self.workspace is not None:
+            self.workspace.finish(job["output_dir"])
+
+    def _finish(self, job_id, status, pdf_path=None, pages=None, error=None, cached=False, metrics=None):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, pdf_path = ?, pages = COALESCE(?, pages), error = ?, cached = ?, "
+                "metrics = ?, finished = ? WHERE id = ?",
+                (status, pdf_path, pages, error, int(cached),
+                 json.dumps(metrics) if metrics else None, time.time(), job_id))
+
+    def _worker(self):
+        governor = get_memory_governor()
+        while not self._stop.is_set():
+            # A job is only claimed once memory allows another conversion, so
+            # it stays queued (and in line) rather than "running" while waiting
+            with governor.slot(timeout=1.0) as admitted:
+                if not admitted:
+                    continue
+                job = self._claim()
+                if job is not None:
+                    try:
+                        self._run(job)
+                    except Exception as e:
+                        self._finish(job["id"], FAILED, error=str(e) or e.__class__.__name__)
+                    continue
+            # Submissions from this process wake us up; other processes
+            # sharing the database are picked up by polling
+            self._wakeup.wait(1.0)
+            self._wakeup.clear()
+
+    def _janitor(self):
+        while not self._stop.wait(60):
+            self.cleanup()
+
+    # Deletes finished jobs older than the retention period, with their files,
+    # and finished jobs whose files the workspace (or PDF cache) already evicted
+    def cleanup(self, now=None):
+        cutoff = (now or time.time()) - self.retention_seconds
+        with self._connect() as db:
+            rows = db.execute("SELECT id, output_dir, pdf_path, finished FROM jobs WHERE status IN (?, ?, ?)",
+                              FINISHED).fetchall()
+            removed = 0
+            for row in rows:
+                evicted = not os.path.isdir(row["output_dir"]) and not (
+                    row["pdf_path"] and os.path.exists(row["pdf_path"]))
+                if row["finished"] < cutoff or evicted:
+                    shutil.rmtree(row["output_dir"], ignore_errors=True)
+                    db.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+                    removed += 1
+        return removed
+
+    # Jobs left "running" by a process that no longer exists go back in line
+    def recover(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            stale = [row["id"] for row in rows
+                     if row["worker_pid"] == os.getpid() or not pid_alive(row["worker_pid"])]
+            for job_id in stale:
+                db.execute("UPDATE jobs SET status = ?, started = NULL, worker_pid = NULL, pages = 0 "
+                           "WHERE id = ?", (QUEUED, job_id))
+            db.execute("COMMIT")
+        return len(stale)
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return self
+            self.recover()
+            self.cleanup()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._janitor, name="job-janitor", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+
+class _Closing:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.db.in_transaction:
+            self.db.execute("ROLLBACK")
+        self.db.close()
+        return False
+
+
+# Process-wide queue with its workers running. Streamlit keeps imported
+# modules across reruns, so the workers outlive any one session.
+def get_job_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            workers = os.environ.get("QUARTO2PDF_QUEUE_WORKERS")
+            _queue = JobQueue(
+                os.environ.get("QUARTO2PDF_QUEUE_DB", os.path.join("output", "jobs.sqlite3")),
+                workers=int(workers) if workers else None,
+                retention_seconds=float(os.environ.get("QUARTO2PDF_JOB_RETENTION_HOURS", "24")) * 3600,
+                cache=get_conversion_cache(),
+                workspace=get_workspace(),
+            ).start()
+        return _queue
@@ -0,0 +1,245 @@
+import os
+import time
+import threading
+import collections
+from contextlib import contextmanager
+from procstats import process_tree_rss
+from metrics import get_metrics_registry
+
+
+# Admission control for conversions based on memory rather than a fixed
+# worker count. Each browser (Selenium's Chrome, Puppeteer's Chromium) can
+# take hundreds of MB on a heavy deck, and the container has a hard memory
+# limit, so a fixed count is either too timid for light decks or gets the
+# container OOM-killed on heavy ones.
+#
+# The governor estimates what one running conversion costs from the RSS of
+# this process's children (browsers, drivers, the node worker) divided by the
+# conversions running, keeping a peak-biased average. Children that stay
+# around between conversions (idle pooled browsers, the Puppeteer worker, the
+# encoder pool) are measured whenever nothing runs, and that idle baseline is
+# subtracted first, so it isn't charged to every conversion. A new conversion is
+# admitted while the memory still available to the container, minus a
+# reserve, fits another one; otherwise it waits. Conversions admitted in the
+# last few seconds haven't grown yet, so they are charged the estimate up
+# front instead of being invisible in the reading. One conversion is always
+# allowed, so a single huge deck still runs. The worker count configured
+# elsewhere (QUARTO2PDF_MAX_PARALLEL, QUARTO2PDF_QUEUE_WORKERS) stays the
+# upper bound.
+
+_MB = 1024 * 1024
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def _read_int(path):
+    try:
+        with open(path, "r") as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    if not value or value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _stat_value(path, key):
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                name, _, value = line.partition(" ")
+                if name == key:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+# Bytes the cgroup can still use before hitting its limit, counting
+# reclaimable page cache as free; None without a memory limit. cgroup v2 first,
+# then v1.
+def cgroup_available(root="/sys/fs/cgroup"):
+    limit = _read_int(os.path.join(root, "memory.max"))
+    if limit is not None:
+        usage = _read_int(os.path.join(root, "memory.current")) or 0
+        inactive = _stat_value(os.path.join(root, "memory.stat"), "inactive_file")
+        return max(0, limit - max(0, usage - inactive))
+
+    v1 = os.path.join(root, "memory")
+    limit = _read_int(os.path.join(v1, "memory.limit_in_bytes"))
+    # v1 reports "no limit" as a huge page-aligned number
+    if limit is not None and limit < 1 << 60:
+        usage = _read_int(os.path.join(v1, "memory.usage_in_bytes")) or 0
+        inactive = _stat_value(os.path.join(v1, "memory.stat"), "total_inactive_file")
+        return max(0, limit - max(0, usage - inactive))
+    return None
+
+
+def meminfo_available():
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+# Memory this process may still allocate: the tighter of the cgroup limit
+# and the host's MemAvailable
+def available_memory():
+    values = [v for v in (cgroup_available(), meminfo_available()) if v is not None]
+    return min(values) if values else None
+
+
+class MemoryGovernor:
+    def __init__(self, job_bytes=400 * _MB, reserve_bytes=256 * _MB, interval=1.0, ramp_seconds=10.0,
+                 root_pid=None, available=available_memory):
+        self.job_bytes = job_bytes            # Current estimate per conversion
+        self.min_job_bytes = job_bytes // 4
+        self.reserve_bytes = reserve_bytes
+        self.interval = interval
+        self.ramp_seconds = ramp_seconds
+        self.root_pid = root_pid or os.getpid()
+        self.active = 0
+        self.waits = 0
+        self.last_available = None
+        self.last_limit = None
+        self.idle_bytes = 0                   # Child RSS with no conversion running
+        self._available = available
+        self._sampled = 0.0
+        self._admitted = collections.deque()  # Admission times within ramp_seconds
+        self._cond = threading.Condition()
+
+    # Folds the current per-conversion RSS into the estimate: rises to a new
+    # peak at once, decays slowly when conversions turn out lighter
+    def _sample(self):
+        now = time.monotonic()
+        if now - self._sampled < self.interval / 2:
+            return
+        self._sampled = now
+        self.last_available = self._available()
+        if not self.active:
+            self._sample_idle()
+        else:
+            per_job = max(0, process_tree_rss(self.root_pid, include_root=False) - self.idle_bytes) / self.active
+            if per_job > self.job_bytes:
+                self.job_bytes = per_job
+            else:
+                self.job_bytes = max(self.min_job_bytes, 0.9 * self.job_bytes + 0.1 * per_job)
+        registry = get_metrics_registry()
+        registry.set_gauge("memory_available_bytes", self.last_available,
+                           "Memory still available to the container.")
+        registry.set_gauge("job_memory_bytes", int(self.job_bytes),
+                           "Estimated memory per running conversion.")
+
+    def _sample_idle(self):
+        self.idle_bytes = process_tree_rss(self.root_pid, include_root=False)
+        get_metrics_registry().set_gauge("idle_memory_bytes", self.idle_bytes,
+                                         "Memory of helper processes with no conversion running.")
+
+    # Number of conversions that may run right now
+    def limit(self):
+        with self._cond:
+            return self._limit()
+
+    def _limit(self):
+        self._sample()
+        now = time.monotonic()
+        while self._admitted and now - self._admitted[0] > self.ramp_seconds:
+            self._admitted.popleft()
+        if self.last_available is None:
+            limit = None
+        else:
+            headroom = self.last_available - self.reserve_bytes - len(self._admitted) * self.job_bytes
+            limit = max(1, self.active + int(max(0, headroom) // max(1, self.job_bytes)))
+        self.last_limit = limit
+        get_metrics_registry().set_gauge("conversion_limit", limit,
+                                         "Conversions the memory governor currently admits.")
+        return limit
+
+    # True once admitted; False if `timeout` seconds passed first. Waiting
+    # conversions re-check every `interval` as memory frees up.
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            waited = False
+            while True:
+                limit = self._limit()
+                if limit is None or self.active < limit:
+                    self.active += 1
+                    self._admitted.append(time.monotonic())
+                    return True
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+
+    def try_acquire(self):
+        return self.acquire(timeout=0)
+
+    def release(self):
+        with self._cond:
+            self.active = max(0, self.active - 1)
+            if self._admitted:
+                self._admitted.popleft()
+            if not self.active:
+                # Browsers the finished conversions left in the pool
+                self._sample_idle()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, timeout=None):
+        admitted = self.acquire(timeout)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release()
+
+    def stats(self):
+        with self._cond:
+            return {"active": self.active, "limit": self.last_limit, "waits": self.waits,
+                    "job_bytes": int(self.job_bytes), "idle_bytes": self.idle_bytes,
+                    "available_bytes": self.last_available}
+
+
+# Admits everything; used when the governor is switched off
+class _Unlimited:
+    def acquire(self, timeout=None):
+        return True
+
+    def try_acquire(self):
+        return True
+
+    def release(self):
+        pass
+
+    @contextmanager
+    def slot(self, timeout=None):
+        yield True
+
+    def stats(self):
+        return {}
+
+
+def get_memory_governor():
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            if os.environ.get("QUARTO2PDF_MEMORY_GOVERNOR", "1") != "1":
+                _governor = _Unlimited()
+            else:
+                _governor = MemoryGovernor(
+                    job_bytes=int(os.environ.get("QUARTO2PDF_JOB_MEMORY_MB", "400")) * _MB,
+                    reserve_bytes=int(os.environ.get("QUARTO2PDF_MEMORY_RESERVE_MB", "256")) * _MB,
+                )
+        return _governor
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+_registry = None
+_server = None
+_lock = threading.Lock()
+
+
+class _Stage:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+# Timings and counters for one conversion. Stage times accumulate, so a stage
+# that runs once per page (e.g. "capture") ends up as the total across pages;
+# the per-page samples are kept separately in `pages`, keyed by page name.
+class JobMetrics:
+    def __init__(self, method, name=None):
+        self.method = method
+        self.name = name
+        self.status = None
+        self.stages = {}
+        self.counters = {}
+        self.pages = {}
+        self.started = time.time()
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def page(self, name, **timings):
+        with self._lock:
+            self.pages.setdefault(name, {}).update(timings)
+
+    def finish(self, status):
+        self.status = status
+        self.elapsed = time.time() - self.started
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "method": self.method,
+                "status": self.status,
+                "elapsed": round(self.elapsed, 4),
+                "stages": {k: round(v, 4) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+                "pages": [dict(t, name=n) for n, t in self.pages.items()],
+            }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# Process-wide aggregate of finished jobs, exported as JSON or in the
+# Prometheus text exposition format
+class MetricsRegistry:
+    def __init__(self, keep_recent=100):
+        self.keep_recent = keep_recent
+        self.recent = []
+        self.jobs = {}            # (method, status) -> count
+        self.job_seconds = {}     # method -> total seconds
+        self.stage_seconds = {}   # (method, stage) -> total seconds
+        self.stage_runs = {}      # (method, stage) -> number of jobs that ran it
+        self.counters = {}        # (method, counter) -> total
+        self.gauges = {}          # name -> (value, help), e.g. the memory governor's state
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        data = metrics.to_dict()
+        method = data["method"]
+        with self._lock:
+            key = (method, data["status"])
+            self.jobs[key] = self.jobs.get(key, 0) + 1
+            self.job_seconds[method] = self.job_seconds.get(method, 0.0) + data["elapsed"]
+            for stage, seconds in data["stages"].items():
+                self.stage_seconds[(method, stage)] = self.stage_seconds.get((method, stage), 0.0) + seconds
+                self.stage_runs[(method, stage)] = self.stage_runs.get((method, stage), 0) + 1
+            for counter, value in data["counters"].items():
+                self.counters[(method, counter)] = self.counters.get((method, counter), 0) + value
+            self.recent.append(data)
+            del self.recent[:-self.keep_recent]
+
+    def set_gauge(self, name, value, help_text=""):
+        with self._lock:
+            self.gauges[name] = (value, help_text)
+
+    def to_json(self):
+        with self._lock:
+            return json.dumps({
+                "gauges": {name: value for name, (value, _) in self.gauges.items()},
+                "jobs": [{"method": m, "status": s, "count": c} for (m, s), c in self.jobs.items()],
+                "stages": [
+                    {"method": m, "stage": st, "seconds": round(v, 4), "runs": self.stage_runs[(m, st)]}
+                    for (m, st), v in self.stage_seconds.items()
+                ],
+                "counters": [{"method": m, "name": n, "value": v} for (m, n), v in self.counters.items()],
+                "recent": list(self.recent),
+            }, indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP quarto2pdf_jobs_total Finished conversions by method and status.")
+            lines.append("# TYPE quarto2pdf_jobs_total counter")
+            for (method, status), count in sorted(self.jobs.items()):
+                lines.append(f'quarto2pdf_jobs_total{{method="{_escape(method)}",status="{_escape(status)}"}} {count}')
+
+            lines.append("# HELP quarto2pdf_job_seconds_total Wall time spent in conversions.")
+            lines.append("# TYPE quarto2pdf_job_seconds_total counter")
+            for method, seconds in sorted(self.job_seconds.items()):
+                lines.append(f'quarto2pdf_job_seconds_total{{method="{_escape(method)}"}} {seconds:.4f}')
+
+            lines.append("# HELP quarto2pdf_stage_seconds_total Time spent per conversion stage.")
+            lines.append("# TYPE quarto2pdf_stage_seconds_total counter")
+            for (method, stage), seconds in sorted(self.stage_seconds.items()):
+                lines.append(
+                    f'quarto2pdf_stage_seconds_total{{method="{_escape(method)}",stage="{_escape(stage)}"}} {seconds:.4f}')
+
+            lines.append("# HELP quarto2pdf_events_total Counted events (pages, tabs, cache hits, ...).")
+            lines.append("# TYPE quarto2pdf_events_total counter")
+            for (method, name), value in sorted(self.counters.items()):
+                lines.append(f'quarto2pdf_events_total{{method="{_escape(method)}",event="{_escape(name)}"}} {value}')
+
+            for name, (value, help_text) in sorted(self.gauges.items()):
+                if value is None:
+                    continue
+                lines.append(f"# HELP quarto2pdf_{name} {help_text}")
+                lines.append(f"# TYPE quarto2pdf_{name} gauge")
+                lines.append(f"quarto2pdf_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body, content_type = self.registry.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body, content_type = self.registry.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def get_metrics_registry():
+    global _registry
+    with _lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+# Serves /metrics (Prometheus text) and /metrics.json on a background thread.
+# Safe to call on every Streamlit rerun; only the first call starts a server.
+# QUARTO2PDF_METRICS_PORT=0 disables it.
+def start_metrics_server(port=None, host="0.0.0.0"):
+    global _server
+    if port is None:
+        port = int(os.environ.get("QUARTO2PDF_METRICS_PORT", "9108"))
+    if not port:
+        return None
+
+    registry = get_metrics_registry()
+    with _lock:
+        if _server is not None:
+            return _server
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        try:
+            _server = ThreadingHTTPServer((host, port), handler)
+        except OSError:
+            return None  # Port taken, e.g. by another app process
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
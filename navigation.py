@@ -0,0 +1,111 @@
+# In-page helpers for finding what to capture on a slide. Each runs as a
+# single execute_script call, since every WebDriver command is an HTTP round
+# trip to the driver and per-element calls add up on busy slides.
+
+TAB_SELECTORS = [
+    "a[role='tab']",
+    ".nav-tabs .nav-link",
+    ".tabset-pills .nav-link",
+    ".panel-tabset .nav-link",
+    "[data-bs-toggle='tab']",
+    "[data-toggle='tab']",
+]
+
+# Returns [elements, labels] for the visible tabs of the first selector that
+# has any, in document order. "Visible" follows WebDriver's is_displayed()
+# closely enough for tabs: rendered boxes, not visibility:hidden, not fully
+# transparent.
+FIND_TABS_JS = r"""
+const selectors = arguments[0];
+// Opacity isn't inherited, so a tab on an inactive Reveal.js slide (opacity 0
+// on the <section>) looks visible by its own style; every ancestor is
+// checked, with results shared between tabs
+const hiddenAncestors = new Map();
+const ancestorHidden = el => {
+  if (!el || el === document.documentElement) return false;
+  if (hiddenAncestors.has(el)) return hiddenAncestors.get(el);
+  const style = getComputedStyle(el);
+  const hidden = style.opacity === "0" || style.display === "none" || style.contentVisibility === "hidden" ||
+    el.hidden || el.getAttribute("aria-hidden") === "true" || ancestorHidden(el.parentElement);
+  hiddenAncestors.set(el, hidden);
+  return hidden;
+};
+const visible = el => {
+  // No boxes: display:none on the tab or an ancestor (collapsed callout)
+  if (!el.getClientRects().length) return false;
+  if (getComputedStyle(el).visibility === "hidden") return false;  // Inherited
+  return !ancestorHidden(el);
+};
+for (const selector of selectors) {
+  let found;
+  try {
+    found = Array.from(document.querySelectorAll(selector)).filter(visible);
+  } catch (e) {
+    continue;
+  }
+  if (found.length) {
+    return [found, found.map(el => (el.innerText || el.textContent || "").trim())];
+  }
+}
+return [[], []];
+"""
+
+
+# Visible tabs on the current slide as (element, label) pairs
+def find_tabs(driver, selectors=None):
+    elements, labels = driver.execute_script(FIND_TABS_JS, selectors or TAB_SELECTORS)
+    return list(zip(elements, labels))
+
+
+# Every slide of a Reveal.js deck as [h, v, f], where f is the index of the
+# last fragment (so jumping there shows the finished slide) or null. Returns
+# null when the page is not a Reveal.js deck with the slide API.
+REVEAL_INDEX_JS = r"""
+const R = window.Reveal;
+if (!R || typeof R.getSlides !== "function" || typeof R.slide !== "function") return null;
+const top = Array.from(document.querySelectorAll(".reveal .slides > section"));
+const lastFragment = slide => {
+  const indices = Array.from(slide.querySelectorAll(".fragment"))
+    .map(el => parseInt(el.getAttribute("data-fragment-index"), 10));
+  if (!indices.length) return null;
+  // Before Reveal sorts them, fragments have no explicit index
+  return indices.every(i => !isNaN(i)) ? Math.max(...indices) : indices.length - 1;
+};
+const slides = R.getSlides().map(slide => {
+  const parent = slide.parentElement;
+  if (parent && parent.tagName === "SECTION") {
+    const stack = Array.from(parent.children).filter(c => c.tagName === "SECTION");
+    return [top.indexOf(parent), stack.indexOf(slide), lastFragment(slide)];
+  }
+  return [top.indexOf(slide), 0, lastFragment(slide)];
+});
+return slides.filter(s => s[0] >= 0);
+"""
+
+
+# Random access to the slides of a Reveal.js deck. The full index
+# (horizontal, vertical and fragments) is read once up front, so the page
+# count is known before capturing and any slide can be reached directly with
+# Reveal.slide(h, v, f); fragment steps are skipped by jumping straight to the
+# last fragment. `settle(slide_to)` performs the jump and waits for the page.
+class RevealNavigator:
+    def __init__(self, slides, settle):
+        self.slides = slides
+        self.settle = settle
+
+    # Returns a navigator, or None for documents without the Reveal.js API
+    @classmethod
+    def detect(cls, driver, settle):
+        try:
+            slides = driver.execute_script(REVEAL_INDEX_JS)
+        except Exception:
+            return None
+        if not slides:
+            return None
+        return cls([tuple(slide) for slide in slides], settle)
+
+    def __len__(self):
+        return len(self.slides)
+
+    def goto(self, number):
+        return self.settle(list(self.slides[number]))
@@ -0,0 +1,170 @@
+import io
+import os
+import time
+import atexit
+import struct
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+
+# Raster encoding profiles for the Selenium (screenshot) method. Screenshots
+# are 2560x1440 and used to be embedded as-is with a made-up 600 DPI label,
+# which gave tiny pages and very large files. Pages are now laid out as 16:9
+# slides PAGE_WIDTH_IN inches wide, and each profile decides how the pixels
+# are stored:
+#
+#   format       "jpeg" (DCTDecode) or "flate" (lossless, PNG predictors)
+#   quality      JPEG quality
+#   subsampling  JPEG chroma subsampling: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0
+#   dpi          downscale to this resolution on the page (None keeps pixels)
+#   palette      flat slides (few distinct colours) are stored as a Flate
+#                indexed image with at most this many colours; 0 disables
+#   compress     zlib level for Flate streams
+OUTPUT_PROFILES = {
+    "print": {"format": "jpeg", "quality": 90, "subsampling": 0, "dpi": None, "palette": 0, "compress": 6},
+    "standard": {"format": "jpeg", "quality": 80, "subsampling": 2, "dpi": 150, "palette": 256, "compress": 6},
+    "screen": {"format": "jpeg", "quality": 65, "subsampling": 2, "dpi": 96, "palette": 128, "compress": 9},
+    "lossless": {"format": "flate", "quality": None, "subsampling": None, "dpi": None, "palette": 256, "compress": 9},
+}
+DEFAULT_PROFILE = "standard"
+
+# 16:9 slide width (PowerPoint's widescreen size); 2560px is ~192 DPI at this width
+PAGE_WIDTH_IN = 13.333
+
+# Frames with more distinct colours than this are photos or gradients, not
+# flat slides, and skip palette reduction (JPEG profiles only; the reduction
+# itself is slightly lossy but keeps text far sharper than JPEG)
+FLAT_MAX_COLORS = 4096
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_profile(name=None):
+    name = name or os.environ.get("QUARTO2PDF_PROFILE", DEFAULT_PROFILE)
+    try:
+        return name, OUTPUT_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown output profile '{name}', expected one of: {', '.join(OUTPUT_PROFILES)}")
+
+
+# Page size in points for a frame of the given pixel size
+def page_size(source_size):
+    width, height = source_size
+    page_w = PAGE_WIDTH_IN * 72.0
+    return page_w, page_w * height / width
+
+
+def _downscale(image, dpi):
+    if not dpi:
+        return image
+    target_w = int(round(dpi * PAGE_WIDTH_IN))
+    width, height = image.size
+    if target_w >= width:
+        return image
+    return image.resize((target_w, max(1, int(round(height * target_w / width)))), Image.LANCZOS)
+
+
+def _jpeg(image, profile):
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=profile["quality"], subsampling=profile["subsampling"], optimize=True)
+    color_space = "/DeviceGray" if image.mode == "L" else "/DeviceRGB"
+    return {"data": buf.getvalue(), "size": image.size, "color_space": color_space,
+            "filter_name": "/DCTDecode"}
+
+
+# Lets Pillow's PNG encoder do the filtering and compression, then embeds the
+# IDAT data directly as a Flate stream with PNG predictors
+def _flate(image, profile):
+    buf = io.BytesIO()
+    image.save(buf, "PNG", compress_level=profile["compress"])
+    png = buf.getvalue()
+
+    pos = 8
+    idat = []
+    palette = b""
+    bits = color_type = None
+    while pos < len(png):
+        length, kind = struct.unpack(">I4s", png[pos:pos + 8])
+        body = png[pos + 8:pos + 8 + length]
+        if kind == b"IHDR":
+            bits, color_type = body[8], body[9]
+        elif kind == b"PLTE":
+            palette = body
+        elif kind == b"IDAT":
+            idat.append(body)
+        pos += 12 + length
+
+    colors = {0: 1, 2: 3, 3: 1}[color_type]
+    if color_type == 3:
+        color_space = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]"
+    else:
+        color_space = "/DeviceGray" if color_type == 0 else "/DeviceRGB"
+    width = image.size[0]
+    return {"data": b"".join(idat), "size": image.size, "color_space": color_space,
+            "filter_name": "/FlateDecode", "bits": bits,
+            "decode_parms": f"<< /Predictor 15 /Colors {colors} /BitsPerComponent {bits} /Columns {width} >>"}
+
+
+# Encodes one PNG screenshot according to a profile. Runs in the encoder
+# processes, so it only takes and returns picklable values. Returns the
+# keyword arguments for StreamingPdfWriter.add_encoded plus some stats.
+def encode_page(data, profile):
+    started = time.perf_counter()
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        source_size = image.size
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        # Lossless profiles only take the palette path when it is exact
+        limit = profile["palette"] if profile["format"] == "flate" else FLAT_MAX_COLORS
+        flat = bool(profile["palette"]) and image.getcolors(limit) is not None
+        image = _downscale(image, profile["dpi"])
+        if flat:
+            image = image.quantize(colors=profile["palette"], method=Image.Quantize.MEDIANCUT,
+                                   dither=Image.Dither.NONE)
+
+        if flat or profile["format"] == "flate":
+            encoded = _flate(image, profile)
+        else:
+            encoded = _jpeg(image, profile)
+
+    encoded["page_size"] = page_size(source_size)
+    stats = {"seconds": time.perf_counter() - started, "bytes": len(encoded["data"]), "palette": flat}
+    return encoded, stats
+
+
+def encode_workers():
+    value = os.environ.get("QUARTO2PDF_ENCODE_WORKERS")
+    if value is not None:
+        return max(0, int(value))
+    return min(4, os.cpu_count() or 1)
+
+
+# Process pool shared by all conversions. Encoding is CPU bound and holds the
+# GIL, so threads would serialise it; "spawn" keeps the children clear of the
+# browser threads and sockets of the parent. Returns None when
+# QUARTO2PDF_ENCODE_WORKERS=0, in which case pages are encoded inline.
+def get_encoder_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            workers = encode_workers()
+            if not workers:
+                return None
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_encoder_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_encoder_pool)
@@ -0,0 +1,103 @@
+import os
+
+
+SLIDE_EVENTS = ["slidechanged"]
+TAB_EVENTS = ["shown.bs.tab"]
+
+# Clicks the target (or jumps to the Reveal.js slide [h, v, f] in slideTo) and
+# resolves once the page has settled:
+#   1. the expected event fired (Reveal.js `slidechanged`, Bootstrap
+#      `shown.bs.tab`), when the library that sends it is on the page
+#   2. running, finite CSS transitions/animations have finished
+#   3. images in the viewport are decoded and web fonts are ready
+#   4. two animation frames have been painted
+# Every step shares one deadline, so a page that never settles costs at most
+# timeoutMs. Returns {ms, fired, timedOut}.
+SETTLE_JS = r"""
+const target = arguments[0];
+const eventNames = arguments[1] || [];
+const timeoutMs = arguments[2];
+const slideTo = arguments[3];
+const done = arguments[arguments.length - 1];
+
+const start = performance.now();
+const deadline = start + timeoutMs;
+const remaining = () => Math.max(0, deadline - performance.now());
+const sleep = ms => new Promise(r => setTimeout(r, ms));
+const bounded = p => Promise.race([p.then(() => false, () => false), sleep(remaining()).then(() => true)]);
+
+let expectEvent = eventNames.some(name =>
+  name === "slidechanged" ? !!window.Reveal : name.endsWith(".bs.tab") ? !!window.bootstrap : true
+);
+
+let fired = false;
+let onFired;
+const firedPromise = new Promise(r => { onFired = r; });
+const listener = () => { fired = true; onFired(); };
+eventNames.forEach(name => document.addEventListener(name, listener, true));
+
+const inViewport = el => {
+  const r = el.getBoundingClientRect();
+  return r.width > 0 && r.height > 0 && r.bottom > 0 && r.right > 0 &&
+    r.top < window.innerHeight && r.left < window.innerWidth;
+};
+
+const nextFrame = () => new Promise(r => requestAnimationFrame(() => r()));
+
+(async () => {
+  let timedOut = false;
+  try {
+    // Bootstrap's Tab.show() returns early for the active tab, so clicking it
+    // sends no shown.bs.tab
+    if (target && (target.classList.contains("active") || target.getAttribute("aria-selected") === "true")) {
+      expectEvent = false;
+    }
+    if (target) target.click();
+    if (slideTo) {
+      const [h, v, f] = slideTo;
+      const current = window.Reveal.getIndices();
+      // Only a change of slide (not of fragment) sends slidechanged
+      if (current.h === h && (current.v || 0) === v) expectEvent = false;
+      if (f === null || f === undefined) window.Reveal.slide(h, v);
+      else window.Reveal.slide(h, v, f);
+    }
+
+    if (expectEvent) timedOut = await bounded(firedPromise) || timedOut;
+
+    if (document.getAnimations) {
+      const finite = document.getAnimations().filter(a => {
+        try {
+          return a.playState === "running" && a.effect.getComputedTiming().endTime !== Infinity;
+        } catch (e) {
+          return false;
+        }
+      });
+      timedOut = await bounded(Promise.all(finite.map(a => a.finished.catch(() => {})))) || timedOut;
+    }
+
+    const pending = Array.from(document.images).filter(img => !img.complete && inViewport(img));
+    timedOut = await bounded(Promise.all(pending.map(img => img.decode().catch(() => {})))) || timedOut;
+
+    if (document.fonts) timedOut = await bounded(document.fonts.ready) || timedOut;
+
+    timedOut = await bounded(nextFrame().then(nextFrame)) || timedOut;
+  } finally {
+    eventNames.forEach(name => document.removeEventListener(name, listener, true));
+  }
+  done({ ms: Math.round(performance.now() - start), fired: fired, timedOut: timedOut });
+})().catch(e => done({ ms: Math.round(performance.now() - start), fired: fired, timedOut: true, error: String(e) }));
+"""
+
+
+def settle_timeouts():
+    return (
+        int(os.environ.get("QUARTO2PDF_SLIDE_SETTLE_MS", "3000")),
+        int(os.environ.get("QUARTO2PDF_TAB_SETTLE_MS", "2000")),
+    )
+
+
+# Optionally clicks `target` or jumps to the Reveal.js slide `slide_to`
+# ([h, v, f]) and waits for the page to settle, up to timeout_ms.
+# The driver's script timeout must be longer than timeout_ms.
+def click_and_settle(driver, target=None, events=None, timeout_ms=3000, slide_to=None):
+    return driver.execute_async_script(SETTLE_JS, target, events or [], timeout_ms, slide_to)
@@ -0,0 +1,369 @@
+import io
+import os
+import time
+import queue
+import threading
+import collections
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from output_profiles import encode_page, get_encoder_pool, get_profile, shutdown_encoder_pool
+from dedup import frame_group
+
+
+# Minimal image-only PDF writer that streams pages to disk as they arrive.
+# Each page is encoded and written immediately, so only one decoded image is
+# held in memory at a time regardless of how many pages the document has.
+# The page tree and cross-reference table are written on close().
+class StreamingPdfWriter:
+    def __init__(self, output_path, resolution=600, quality=75):
+        self.output_path = output_path
+        self.resolution = float(resolution)
+        self.quality = quality
+        self.page_count = 0
+
+        self._file = open(output_path, "wb")
+        self._offsets = {}
+        self._page_ids = []
+        # 1 and 2 are reserved for the catalog and the page tree
+        self._next_id = 3
+
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _new_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode("ascii"))
+        self._file.write(body.encode("ascii"))
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def _encode(self, image):
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buf = io.BytesIO()
+        image.save(buf, "JPEG", quality=self.quality)
+        color_space = "/DeviceGray" if image.mode == "L" else "/DeviceRGB"
+        return buf.getvalue(), image.size, color_space, "/DCTDecode"
+
+    def add_image(self, image):
+        data, size, color_space, filter_name = self._encode(image)
+        self.add_encoded(data, size, color_space, filter_name)
+
+    # Adds a page whose image stream is already encoded. page_size is in
+    # points; without it the page is sized from the pixels and `resolution`.
+    def add_encoded(self, data, size, color_space="/DeviceRGB", filter_name="/DCTDecode",
+                    bits=8, decode_parms=None, page_size=None):
+        width, height = size
+        if page_size:
+            page_w, page_h = page_size
+        else:
+            page_w = width * 72.0 / self.resolution
+            page_h = height * 72.0 / self.resolution
+
+        parms = f"/DecodeParms {decode_parms} " if decode_parms else ""
+        image_id = self._new_id()
+        self._write_object(
+            image_id,
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace {color_space} /BitsPerComponent {bits} /Filter {filter_name} "
+            f"{parms}/Length {len(data)} >>",
+            data,
+        )
+
+        content = f"q {page_w:.4f} 0 0 {page_h:.4f} 0 0 cm /Im0 Do Q".encode("ascii")
+        content_id = self._new_id()
+        self._write_object(content_id, f"<< /Length {len(content)} >>", content)
+
+        page_id = self._new_id()
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:.4f} {page_h:.4f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>",
+        )
+        self._page_ids.append(page_id)
+        self.page_count += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        self._write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._file.tell()
+        size = self._next_id
+        self._file.write(f"xref\n0 {size}\n".encode("ascii"))
+        self._file.write(b"0000000000 65535 f \n")
+        for obj_id in range(1, size):
+            self._file.write(f"{self._offsets[obj_id]:010d} 00000 n \n".encode("ascii"))
+        self._file.write(
+            f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+        )
+        self._file.close()
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def write_pdf_from_image_files(image_paths, output_path, resolution=600):
+    with StreamingPdfWriter(output_path, resolution=resolution) as writer:
+        for path in image_paths:
+            with Image.open(path) as image:
+                writer.add_image(image)
+    return writer.page_count
+
+
+# Feeds screenshots captured in memory into a StreamingPdfWriter on a
+# background thread, so assembly overlaps with the browser capturing the next
+# page. The queue is bounded to keep memory flat when capture runs ahead of
+# assembly. Pages are encoded according to an output profile (see
+# output_profiles.py) on the shared encoder processes, several at a time, and
+# written in capture order. With debug_dir set, the raw PNGs are also written
+# there for inspection. An optional FrameDeduplicator drops repeated frames
+# before they are encoded; to let a near-duplicate replace its predecessor,
+# one frame is held back until the next arrives.
+class PdfAssembler:
+    def __init__(self, output_path, profile=None, debug_dir=None, max_pending=4, metrics=None, dedup=None,
+                 pool=None):
+        self.output_path = output_path
+        self.debug_dir = debug_dir
+        self.metrics = metrics
+        self.dedup = dedup
+        self.max_pending = max_pending
+        self.profile_name, self.profile = get_profile(profile)
+        self.page_count = 0
+
+        if debug_dir:
+            os.makedirs(debug_dir, exist_ok=True)
+
+        # pool=False encodes on the assembler thread instead
+        self._pool = get_encoder_pool() if pool is None else (pool or None)
+        self._inflight = collections.deque()  # (name, data, future, seconds) in page order
+        self._writer = StreamingPdfWriter(output_path)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="pdf-assembler", daemon=True)
+        self._thread.start()
+
+    def _record(self, name, seconds, counter=None, stats=None):
+        if self.metrics is None:
+            return
+        self.metrics.add_time("pdf_assembly", seconds)
+        self.metrics.page(name, assembly=round(seconds, 4))
+        if counter:
+            self.metrics.count(counter)
+        if stats:
+            # Encoding runs in other processes, in parallel with assembly
+            self.metrics.add_time("encode", stats["seconds"])
+            self.metrics.page(name, encode=round(stats["seconds"], 4), bytes=stats["bytes"])
+            self.metrics.count("encoded_bytes", stats["bytes"])
+            if stats["palette"]:
+                self.metrics.count("palette_pages")
+
+    def _write(self, name, result, seconds):
+        encoded, stats = result
+        started = time.perf_counter()
+        self._writer.add_encoded(**encoded)
+        self.page_count += 1
+        self._record(name, seconds + time.perf_counter() - started, stats=stats)
+
+    def _encode(self, name, data, seconds):
+        if self._pool is not None:
+            try:
+                future = self._pool.submit(encode_page, data, self.profile)
+            except Exception:
+                self._pool = None  # Pool unusable (e.g. shut down); encode here
+            else:
+                self._inflight.append((name, data, future, seconds))
+                self._flush(self.max_pending)
+                return
+        self._write(name, encode_page(data, self.profile), seconds)
+
+    # Writes finished pages in order, blocking while more than `limit` are in flight
+    def _flush(self, limit):
+        while self._inflight and (len(self._inflight) > limit or self._inflight[0][2].done()):
+            name, data, future, seconds = self._inflight.popleft()
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                # An encoder process died; drop the pool and finish inline
+                shutdown_encoder_pool()
+                self._pool = None
+                result = encode_page(data, self.profile)
+            self._write(name, result, seconds)
+
+    def _cancel_inflight(self):
+        while self._inflight:
+            self._inflight.popleft()[2].cancel()
+
+    def _run(self):
+        pending = None  # (name, PNG bytes, seconds spent so far)
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue  # Drain the queue so submit() never blocks forever
+            name, data, slide = item
+            try:
+                started = time.perf_counter()
+                if self.debug_dir:
+                    with open(os.path.join(self.debug_dir, name), "wb") as f:
+                        f.write(data)
+
+                if self.dedup is not None and self.dedup.is_exact_duplicate(data):
+                    self._record(name, time.perf_counter() - started, "dedup_exact")
+                    continue
+
+                if self.dedup is not None and self.dedup.mode == "perceptual":
+                    with Image.open(io.BytesIO(data)) as image:
+                        near_duplicate = self.dedup.is_near_duplicate(image, frame_group(name, slide))
+                    if near_duplicate and pending is not None:
+                        self._record(pending[0], pending[2], "dedup_perceptual")
+                        pending = None
+
+                if pending is not None:
+                    self._encode(*pending)
+                pending = (name, data, time.perf_counter() - started)
+            except Exception as e:
+                self._error = e
+
+        try:
+            if self._error is None:
+                if pending is not None:
+                    self._encode(*pending)
+                self._flush(0)
+        except Exception as e:
+            self._error = e
+        self._cancel_inflight()
+
+    # `slide` identifies the slide a frame shows when the name's page number
+    # doesn't (fragment steps), see frame_group in dedup.py
+    def submit(self, name, data, slide=None):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((name, data, slide))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            self._writer.abort()
+            raise self._error
+        self._writer.close()
+        return self.page_count
+
+    def abort(self):
+        if self._thread.is_alive():
+            self._error = self._error or RuntimeError("aborted")
+            self._queue.put(None)
+            self._thread.join()
+        self._writer.abort()
+
+
+def _page_content(page):
+    parts = [page.get_contents().get_data() if page.get_contents() is not None else b""]
+    xobjects = page.get("/Resources", {}).get("/XObject", {})
+    for name in sorted(xobjects):
+        parts.append(name.encode() + b"\0" + xobjects[name].get_object().get_data())
+    return b"\0".join(parts)
+
+
+# Counterpart of PdfAssembler for vector captures: every submitted item is a
+# one-page PDF printed by the browser (see SeleniumMethod's "vector" capture),
+# and the pages are merged into output_path in submission order on a
+# background thread. Text stays selectable and nothing is re-encoded. Exact
+# dedup compares the page content stream plus the images it draws, since the
+# bytes of two prints of the same state differ in their metadata.
+class VectorAssembler:
+    def __init__(self, output_path, debug_dir=None, max_pending=8, metrics=None, dedup=None):
+        self.output_path = output_path
+        self.debug_dir = debug_dir
+        self.metrics = metrics
+        self.dedup = dedup
+        self.page_count = 0
+
+        if debug_dir:
+            os.makedirs(debug_dir, exist_ok=True)
+
+        self._writer = PdfWriter()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="pdf-merger", daemon=True)
+        self._thread.start()
+
+    def _record(self, name, seconds, counter=None):
+        if self.metrics is None:
+            return
+        self.metrics.add_time("pdf_assembly", seconds)
+        self.metrics.page(name, assembly=round(seconds, 4))
+        if counter:
+            self.metrics.count(counter)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue  # Drain the queue so submit() never blocks forever
+            name, data, slide = item
+            try:
+                started = time.perf_counter()
+                if self.debug_dir:
+                    with open(os.path.join(self.debug_dir, os.path.splitext(name)[0] + ".pdf"), "wb") as f:
+                        f.write(data)
+                page = PdfReader(io.BytesIO(data)).pages[0]
+                if self.dedup is not None and self.dedup.is_exact_duplicate(_page_content(page)):
+                    self._record(name, time.perf_counter() - started, "dedup_exact")
+                    continue
+                self._writer.add_page(page)
+                self.page_count += 1
+                self._record(name, time.perf_counter() - started)
+                if self.metrics is not None:
+                    self.metrics.count("vector_bytes", len(data))
+            except Exception as e:
+                self._error = e
+
+    def submit(self, name, data, slide=None):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((name, data))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        if not self.page_count:
+            return 0
+        # Fonts and images repeated across prints are stored once
+        self._writer.compress_identical_objects(remove_orphans=True)
+        with open(self.output_path, "wb") as f:
+            self._writer.write(f)
+        return self.page_count
+
+    def abort(self):
+        if self._thread.is_alive():
+            self._error = self._error or RuntimeError("aborted")
+            self._queue.put(None)
+            self._thread.join()
@@ -0,0 +1,184 @@
+import os
+import json
+import codecs
+import threading
+from html.parser import HTMLParser
+from conversion_cache import _atomic_write
+
+
+# Progress and ETA without guessing. Before a file is converted, a streaming
+# pass over its HTML (no browser) counts the Reveal.js slides and the tabs on
+# them; a Selenium conversion captures one frame per slide plus one per tab.
+# A per-method throughput model, fitted on finished conversions and kept on
+# disk, turns that count into expected seconds. Together they drive the
+# progress bars and ETAs in the web UIs and flag jobs running far longer than
+# expected.
+
+_CHUNK = 256 * 1024
+# Elements the parser never sees an end tag for
+_VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+_model = None
+_model_lock = threading.Lock()
+
+
+class Prescan:
+    def __init__(self, slides=1, tabs=0, tabsets=0, reveal=False):
+        self.slides = slides
+        self.tabs = tabs
+        self.tabsets = tabsets
+        self.reveal = reveal
+
+    # Captures a Selenium conversion makes: every slide plus every tab state
+    @property
+    def frames(self):
+        return self.slides + self.tabs
+
+    def to_dict(self):
+        return {"slides": self.slides, "tabs": self.tabs, "tabsets": self.tabsets, "reveal": self.reveal}
+
+
+class _SlideCounter(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.reveal = False
+        self.slides = 0
+        self.tabs = 0
+        self.tabsets = 0
+        # One entry per open <section>: True once it contains another section
+        # (a vertical stack, which isn't a slide itself) or is hidden
+        self._sections = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID:
+            return
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if "reveal" in classes:
+            self.reveal = True
+        if "panel-tabset" in classes:
+            self.tabsets += 1
+        if attrs.get("role") == "tab" or attrs.get("data-bs-toggle") == "tab" or attrs.get("data-toggle") == "tab":
+            self.tabs += 1
+        if tag == "section":
+            if self._sections:
+                self._sections[-1] = True
+            self._sections.append(attrs.get("data-visibility") == "hidden")
+
+    def handle_endtag(self, tag):
+        if tag == "section" and self._sections:
+            skip = self._sections.pop()
+            if not skip:
+                self.slides += 1
+
+
+# Counts slides and tabs in an HTML file (path or binary file object),
+# reading it in chunks so large self-contained decks never sit in memory
+# whole. Documents that aren't Reveal.js decks count as one page.
+def scan_html(source):
+    counter = _SlideCounter()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            counter.feed(decoder.decode(chunk))
+        counter.feed(decoder.decode(b"", final=True))
+        counter.close()
+    finally:
+        if f is not source:
+            f.close()
+    if not counter.reveal or not counter.slides:
+        return Prescan(1, counter.tabs, counter.tabsets, counter.reveal)
+    return Prescan(counter.slides, counter.tabs, counter.tabsets, True)
+
+
+# seconds = overhead + per_frame * frames, fitted per method by least squares
+# over exponentially decayed sums, so the model follows changes in hardware
+# or settings. Until two differently sized jobs have been seen, the per-frame
+# cost comes from the prior and the observed average.
+class ThroughputModel:
+    PRIOR = {"overhead": 5.0, "per_frame": 1.5}
+    DECAY = 0.95
+
+    def __init__(self, path=None):
+        self.path = path
+        self._stats = {}  # method -> {"n", "x", "y", "xx", "xy"}
+        self._lock = threading.Lock()
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._stats = json.load(f)
+            except (OSError, ValueError):
+                self._stats = {}
+
+    def observe(self, method, frames, seconds):
+        if frames <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            stats = self._stats.setdefault(method, {"n": 0.0, "x": 0.0, "y": 0.0, "xx": 0.0, "xy": 0.0})
+            for key in stats:
+                stats[key] *= self.DECAY
+            stats["n"] += 1
+            stats["x"] += frames
+            stats["y"] += seconds
+            stats["xx"] += frames * frames
+            stats["xy"] += frames * seconds
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            data = json.dumps(self._stats).encode("utf-8")
+            _atomic_write(self.path, lambda out: out.write(data))
+        except OSError:
+            pass
+
+    # (overhead seconds, seconds per frame) for `method`
+    def coefficients(self, method):
+        with self._lock:
+            stats = self._stats.get(method)
+            if not stats or stats["n"] < 0.5:
+                return self.PRIOR["overhead"], self.PRIOR["per_frame"]
+            n, x, y, xx, xy = stats["n"], stats["x"], stats["y"], stats["xx"], stats["xy"]
+        variance = n * xx - x * x
+        if n >= 1.5 and variance > 1e-6 * n * xx:
+            per_frame = (n * xy - x * y) / variance
+            overhead = (y - per_frame * x) / n
+            if per_frame > 0 and overhead >= 0:
+                return overhead, per_frame
+        # Not enough spread to separate the two: keep the prior overhead
+        overhead = min(self.PRIOR["overhead"], 0.5 * y / n)
+        return overhead, max(0.01, (y - overhead * n) / max(x, 1e-9))
+
+    def predict(self, method, frames):
+        overhead, per_frame = self.coefficients(method)
+        return overhead + per_frame * max(frames, 1)
+
+
+def get_throughput_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = ThroughputModel(os.environ.get("QUARTO2PDF_THROUGHPUT_FILE",
+                                                    os.path.join("output", "throughput.json")))
+        return _model
+
+
+# (fraction done, seconds left) for a conversion `elapsed` seconds in with
+# `pages` of `slides` slides reported so far. Slide reports give the actual
+# pace; before the first one (and for methods that only report at the end)
+# the model's estimate is used. The fraction stays below 1 until the job ends.
+def progress_estimate(expected_seconds, elapsed, slides=None, pages=0):
+    if slides and pages:
+        fraction = min(pages / slides, 0.99)
+        remaining = elapsed / pages * max(0, slides - pages)
+        if expected_seconds:
+            # Early on, lean on the model; per-slide pace takes over as it builds up
+            weight = min(1.0, pages / 5)
+            remaining = weight * remaining + (1 - weight) * max(0.0, expected_seconds - elapsed)
+        return fraction, remaining
+    if expected_seconds:
+        return min(elapsed / expected_seconds, 0.95), max(0.0, expected_seconds - elapsed)
+    return 0.0, None
@@ -0,0 +1,109 @@
+import os
+import threading
+
+
+# Process-tree memory accounting from /proc (Linux only). Browsers run as
+# grandchildren of this process (chromedriver -> chrome, node -> chromium),
+# so looking at our own RSS alone says little about what a conversion costs.
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _read_stat(pid):
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name is in parentheses and may itself contain spaces
+    fields = data[data.rfind(")") + 2:].split()
+    ppid = int(fields[1])
+    rss_pages = int(fields[21])
+    return ppid, rss_pages * _PAGE_SIZE
+
+
+# Start time of a process in clock ticks since boot (None if it's gone).
+# Together with the pid it identifies a process across pid reuse, e.g. after
+# a container restart where the app is pid 1 again.
+def process_start_time(pid):
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            data = f.read()
+    except (OSError, TypeError):
+        return None
+    return int(data[data.rfind(")") + 2:].split()[19])
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError, OSError):
+        return True
+    return True
+
+
+def _snapshot():
+    stats = {}
+    try:
+        pids = [int(p) for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return stats
+    for pid in pids:
+        stat = _read_stat(pid)
+        if stat is not None:
+            stats[pid] = stat
+    return stats
+
+
+def descendants(root_pid, snapshot=None):
+    snapshot = snapshot if snapshot is not None else _snapshot()
+    children = {}
+    for pid, (ppid, _) in snapshot.items():
+        children.setdefault(ppid, []).append(pid)
+
+    found = []
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        for child in children.get(pid, []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+# Resident memory in bytes of root_pid plus all of its descendants
+def process_tree_rss(root_pid=None, include_root=True):
+    root_pid = root_pid or os.getpid()
+    snapshot = _snapshot()
+    pids = descendants(root_pid, snapshot)
+    if include_root:
+        pids.append(root_pid)
+    return sum(snapshot[pid][1] for pid in pids if pid in snapshot)
+
+
+# Samples process_tree_rss on a background thread and keeps the peak
+class RssSampler:
+    def __init__(self, root_pid=None, interval=0.1):
+        self.root_pid = root_pid or os.getpid()
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.root_pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = process_tree_rss(self.root_pid)
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
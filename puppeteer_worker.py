@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import atexit
+import itertools
+import threading
+import subprocess
+
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.js")
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class PuppeteerJob:
+    def __init__(self, job_id, on_stage=None):
+        self.id = job_id
+        self.on_stage = on_stage
+        self.stages = []
+        self.process = None
+        self.result = None
+        self.started_at = None  # Set by the first stage event
+        self.done = threading.Event()
+
+
+# Client for worker.js: one Node process with one Chromium, fed jobs over
+# stdin and answering with line-delimited JSON on stdout. Several jobs may
+# be in flight at once; replies are matched back to them by id.
+class PuppeteerWorker:
+    def __init__(self, script=WORKER_SCRIPT, concurrency=2):
+        self.script = script
+        self.concurrency = concurrency
+        self.process = None
+        self.stderr_tail = []
+
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _start(self):
+        env = dict(os.environ)
+        env["QUARTO2PDF_WORKER_CONCURRENCY"] = str(self.concurrency)
+        self.process = subprocess.Popen(
+            ["node", self.script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            cwd=os.path.dirname(self.script),
+            env=env,
+        )
+        threading.Thread(target=self._read_stdout, args=(self.process,), daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(self.process,), daemon=True).start()
+
+    def _ensure_running(self):
+        with self._lock:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+
+    def _read_stdout(self, process):
+        for line in process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+
+            with self._lock:
+                job = self._jobs.get(msg.get("id"))
+            if job is None:
+                continue
+
+            if msg.get("event") == "stage":
+                if job.started_at is None:
+                    job.started_at = time.monotonic()
+                job.stages.append(msg.get("message", ""))
+                if job.on_stage:
+                    try:
+                        job.on_stage(msg.get("message", ""))
+                    except Exception:
+                        pass
+            elif "status" in msg:
+                job.result = msg
+                job.done.set()
+
+        # Worker exited: fail whatever was still waiting on it
+        with self._lock:
+            pending = [j for j in self._jobs.values() if j.process is process and not j.done.is_set()]
+        for job in pending:
+            job.result = {
+                "id": job.id,
+                "status": "error",
+                "error": "Puppeteer worker exited unexpectedly:\n" + "\n".join(self.stderr_tail),
+            }
+            job.done.set()
+
+    def _read_stderr(self, process):
+        for line in process.stderr:
+            self.stderr_tail.append(line.rstrip())
+            del self.stderr_tail[:-50]
+
+    def _send(self, msg):
+        with self._write_lock:
+            self.process.stdin.write(json.dumps(msg) + "\n")
+            self.process.stdin.flush()
+
+    # poll(), if given, is called about once a second while the job runs; an
+    # exception it raises (e.g. to cancel) cancels the job in worker.js and
+    # propagates
+    def render(self, input_path, output_path, timeout=300, on_stage=None, poll=None):
+        self._ensure_running()
+
+        job = PuppeteerJob(f"job-{next(self._ids)}", on_stage)
+        with self._lock:
+            job.process = self.process
+            self._jobs[job.id] = job
+
+        try:
+            self._send({
+                "id": job.id,
+                "input": os.path.abspath(input_path),
+                "output": os.path.abspath(output_path),
+            })
+            try:
+                finished = self._wait(job, timeout, poll)
+            except BaseException:
+                self.cancel(job.id)
+                raise
+            if not finished:
+                self.cancel(job.id)
+                raise TimeoutError(f"Puppeteer job timed out after {timeout} seconds")
+            return job.result, job.stages
+        finally:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+
+    # worker.js runs `concurrency` jobs at once and queues the rest, so the
+    # timeout counts from the job's first stage event rather than from when
+    # it was sent. False once it has run for longer than that.
+    def _wait(self, job, timeout, poll=None):
+        while not job.done.wait(1.0):
+            if poll:
+                poll()
+            if job.started_at is not None and time.monotonic() - job.started_at >= timeout:
+                return False
+        return True
+
+    def cancel(self, job_id):
+        try:
+            self._send({"id": job_id, "cancel": True})
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=30)
+        except Exception:
+            process.kill()
+
+
+# Shared worker for the process; survives Streamlit reruns like the browser pool
+def get_puppeteer_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = PuppeteerWorker(
+                concurrency=int(os.environ.get("QUARTO2PDF_WORKER_CONCURRENCY", "2")),
+            )
+        return _worker
+
+
+def shutdown_puppeteer_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _worker.close()
+            _worker = None
+
+
+atexit.register(shutdown_puppeteer_worker)
@@ -0,0 +1,456 @@
+// render.js — shared Puppeteer rendering steps for bot.js and worker.js
+// Quarto HTML to PDF A3 landscape
+
+const puppeteer = require("puppeteer");
+const fs = require("fs");
+const path = require("path");
+const crypto = require("crypto");
+
+const withTimeout = (p, ms, label) =>
+  Promise.race([
+    p,
+    new Promise((_, rej) =>
+      setTimeout(() => rej(new Error(`[TIMEOUT ${ms}ms] ${label}`)), ms)
+    ),
+  ]);
+
+const delay = ms => new Promise(res => setTimeout(res, ms));
+
+// Runs one render stage and adds its duration (ms) to timings[name]
+async function timed(timings, name, fn) {
+  const started = Date.now();
+  try {
+    return await fn();
+  } finally {
+    timings[name] = (timings[name] || 0) + (Date.now() - started);
+  }
+}
+
+// Function to find Chrome/Chromium executable
+function findChromePath(log = console.log) {
+  const possiblePaths = [
+    process.env.PUPPETEER_EXECUTABLE_PATH,
+    process.env.CHROME_EXECUTABLE_PATH,
+    "/usr/bin/chromium",
+    "/usr/bin/chromium-browser",
+    "/usr/bin/google-chrome",
+    "/usr/bin/google-chrome-stable",
+    "/snap/bin/chromium",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",
+    "C:\\Program Files (x86)\\Google\\Chrome\\Application\\chrome.exe"
+  ];
+
+  for (const chromePath of possiblePaths) {
+    if (chromePath && fs.existsSync(chromePath)) {
+      log(`Found Chrome at: ${chromePath}`);
+      return chromePath;
+    }
+  }
+
+  log("Chrome not found in standard locations, trying default...");
+  return undefined; // Let Puppeteer use default
+}
+
+async function launchBrowser(log = console.log) {
+  const executablePath = findChromePath(log);
+
+  try {
+    // Try with found executable first. No --single-process: the browser is
+    // shared by several jobs, each in its own context.
+    const launchOptions = {
+      headless: "new",
+      args: [
+        "--no-sandbox",
+        "--disable-setuid-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-gpu",
+        "--no-zygote",
+        "--allow-file-access-from-files",
+        "--enable-local-file-accesses",
+        "--disable-web-security",
+        "--disable-background-timer-throttling",
+        "--disable-backgrounding-occluded-windows",
+        "--disable-renderer-backgrounding",
+        "--disable-features=TranslateUI",
+        "--disable-ipc-flooding-protection"
+      ],
+      timeout: 60000 // 60 second timeout for browser launch
+    };
+
+    if (executablePath) {
+      launchOptions.executablePath = executablePath;
+    }
+
+    return await puppeteer.launch(launchOptions);
+  } catch (error) {
+    log("First launch attempt failed, trying fallback...");
+    log(`Error: ${error.message}`);
+
+    // Fallback: try without custom executable path
+    return await puppeteer.launch({
+      headless: "new",
+      args: [
+        "--no-sandbox",
+        "--disable-setuid-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-gpu"
+      ],
+      timeout: 60000
+    });
+  }
+}
+
+// Isolated context per job; the method name changed in Puppeteer 22
+async function newContext(browser) {
+  if (typeof browser.createBrowserContext === "function") {
+    return browser.createBrowserContext();
+  }
+  return browser.createIncognitoBrowserContext();
+}
+
+// Local CDN asset cache shared with asset_cache.py (same layout and modes):
+// <dir>/<sha256(url)>.body and .json; QUARTO2PDF_ASSETS is off, cache or offline
+function assetSettings() {
+  return {
+    dir: path.resolve(process.env.QUARTO2PDF_ASSET_DIR || "asset-cache"),
+    mode: process.env.QUARTO2PDF_ASSETS || "cache"
+  };
+}
+
+// Overall time budget for loading and decoding every image of a document
+function imageBudgetMs() {
+  const ms = parseInt(process.env.QUARTO2PDF_IMAGE_BUDGET_MS || "10000", 10);
+  return Number.isFinite(ms) && ms >= 0 ? ms : 10000;
+}
+
+// misses.txt lists each URL once and at most MAX_MISSES of them, like
+// AssetCache.record_miss in asset_cache.py
+const MAX_MISSES = 10000;
+const recordedMisses = new Map(); // dir -> Set of URLs already in its misses.txt
+
+function recordMiss(dir, url) {
+  let seen = recordedMisses.get(dir);
+  if (!seen) {
+    let lines = [];
+    try {
+      lines = fs.readFileSync(path.join(dir, "misses.txt"), "utf8").split("\n").filter(Boolean);
+    } catch (e) {}
+    seen = new Set(lines);
+    recordedMisses.set(dir, seen);
+  }
+  if (seen.has(url) || seen.size >= MAX_MISSES) return;
+  seen.add(url);
+  fs.mkdir(dir, { recursive: true }, () => {
+    fs.appendFile(path.join(dir, "misses.txt"), url + "\n", () => {});
+  });
+}
+
+// Answers remote requests from the asset cache. Misses go to the network in
+// "cache" mode and fail immediately in "offline" mode, instead of hanging
+// until the font/image/MathJax timeouts. Hits and misses are counted in stats.
+async function interceptAssets(page, log = console.log, stats = {}) {
+  const { dir, mode } = assetSettings();
+  if (mode === "off") return stats;
+  stats.asset_hits = 0;
+  stats.asset_misses = 0;
+
+  await page.setRequestInterception(true);
+  page.on("request", request => {
+    const url = request.url().split("#")[0];
+    if (!/^https?:\/\//.test(url)) {
+      request.continue().catch(() => {});
+      return;
+    }
+    const base = path.join(dir, crypto.createHash("sha256").update(url).digest("hex"));
+    fs.promises.readFile(base + ".json", "utf8")
+      .then(text => fs.promises.readFile(base + ".body").then(body => {
+        stats.asset_hits++;
+        return request.respond({
+          status: 200,
+          contentType: JSON.parse(text).content_type || "application/octet-stream",
+          headers: { "Access-Control-Allow-Origin": "*" },
+          body
+        });
+      }))
+      .catch(() => {
+        stats.asset_misses++;
+        recordMiss(dir, url);
+        return mode === "offline" ? request.abort("internetdisconnected") : request.continue();
+      })
+      .catch(err => log(`Asset interception failed for ${url}: ${err.message}`));
+  });
+  return stats;
+}
+
+// Returns per-stage timings in milliseconds; counters (asset hits/misses,
+// images decoded/failed/pending) are added to `stats`
+async function renderToPdf(page, inAbs, outAbs, log = console.log, timings = {}, stats = {}) {
+  if (!fs.existsSync(inAbs)) {
+    throw new Error(`Input not found: ${inAbs}`);
+  }
+
+  // Set longer timeouts
+  page.setDefaultTimeout(120000); // 2 minutes
+  page.setDefaultNavigationTimeout(120000); // 2 minutes
+
+  log("[2/9] Set viewport A3 landscape…");
+  await page.setViewport({ width: 1587, height: 1123 });
+
+  await interceptAssets(page, log, stats);
+
+  const fileUrl = `file://${inAbs}`;
+  log(`[3/9] Goto DOMContentLoaded: ${fileUrl}`);
+
+  await timed(timings, "navigation", async () => {
+    try {
+      await withTimeout(
+        page.goto(fileUrl, {
+          waitUntil: "domcontentloaded",
+          timeout: 120000
+        }),
+        120000,
+        "page.goto(domcontentloaded)"
+      );
+    } catch (gotoError) {
+      log(`Failed to load page: ${gotoError.message}`);
+      // Try with networkidle0 as fallback
+      log("Trying with networkidle0...");
+      await page.goto(fileUrl, {
+        waitUntil: "networkidle0",
+        timeout: 120000
+      });
+    }
+  });
+
+  log("[4/9] Wait for fonts (best effort) …");
+  await timed(timings, "fonts", () => withTimeout(
+    page.evaluate(() => (document.fonts ? document.fonts.ready : Promise.resolve())),
+    15000,
+    "document.fonts.ready"
+  ).catch(err => {
+    log(`Font loading timeout (continuing anyway): ${err.message}`);
+  }));
+
+  log("[5/9] Click through tabsets…");
+  await timed(timings, "tab_clicks", () => withTimeout(
+    page.evaluate(async () => {
+      const sleep = ms => new Promise(r => setTimeout(r, ms));
+      const selectors = [
+        "a[role='tab']",
+        ".nav-tabs .nav-link",
+        ".tabset-pills .nav-link",
+        ".panel-tabset .nav-link",
+        "[data-bs-toggle='tab']",
+        "[data-toggle='tab']"
+      ];
+      let clicked = 0;
+      for (const sel of selectors) {
+        const nodes = Array.from(document.querySelectorAll(sel));
+        for (const el of nodes) {
+          try {
+            el.click();
+            clicked++;
+            await sleep(200); // Reduced delay
+          } catch {}
+        }
+        if (clicked > 0) break;
+      }
+      console.log(`Clicked ${clicked} tabs`);
+    }),
+    15000,
+    "click tabsets"
+  ).catch(err => {
+    log(`Tab clicking timeout (continuing anyway): ${err.message}`);
+  }));
+
+  log("[6/9] Force lazy content to load…");
+  // Finds deferred content directly instead of scrolling the page to trigger
+  // it: data-src style attributes are promoted, loading="lazy" becomes eager
+  // and images are made visible. Scrolling 100px per tick never reached the
+  // bottom of long documents and still cost timer ticks on short ones.
+  await timed(timings, "lazy_content", () => page.evaluate(() => {
+    let promoted = 0;
+    const promote = (el, from, to) => {
+      const value = el.getAttribute(from);
+      if (value && !el.getAttribute(to)) {
+        el.setAttribute(to, value);
+        promoted++;
+      }
+    };
+    document.querySelectorAll("img, iframe, video, audio, source").forEach(el => {
+      ["data-src", "data-lazy-src", "data-original"].forEach(a => promote(el, a, "src"));
+      ["data-srcset", "data-lazy-srcset"].forEach(a => promote(el, a, "srcset"));
+      if (el.getAttribute("loading") === "lazy") el.setAttribute("loading", "eager");
+      if (el.tagName === "VIDEO" || el.tagName === "AUDIO") {
+        if (el.getAttribute("preload") === "none") el.setAttribute("preload", "metadata");
+      }
+    });
+    document.querySelectorAll("[data-bg]").forEach(el => {
+      if (!el.style.backgroundImage) {
+        el.style.backgroundImage = `url("${el.getAttribute("data-bg")}")`;
+        promoted++;
+      }
+    });
+    document.querySelectorAll("img").forEach(img => {
+      img.style.display = "block";
+      img.style.visibility = "visible";
+      img.style.opacity = "1";
+      img.style.height = "auto";
+      img.style.maxWidth = "100%";
+      img.style.objectFit = "contain";
+    });
+    return promoted;
+  })).then(promoted => log(`Promoted ${promoted} lazy attributes`));
+
+  log("[7/9] Decode images within one budget…");
+  // All images load and decode in parallel (img.decode() also waits for the
+  // download), and the whole set shares a single time budget, so the wait
+  // depends on the slowest image rather than on the image count. Broken
+  // images settle at once; whatever is still pending at the deadline is
+  // printed as it stands.
+  const imageBudget = imageBudgetMs();
+  await timed(timings, "image_wait", () => withTimeout(
+    page.evaluate(async budget => {
+      const imgs = Array.from(document.images).filter(img => img.currentSrc || img.getAttribute("src") || img.getAttribute("srcset"));
+      const counts = { decoded: 0, failed: 0, pending: imgs.length };
+      const decodes = imgs.map(img => img.decode().then(
+        () => { counts.decoded++; counts.pending--; },
+        () => { counts.failed++; counts.pending--; }
+      ));
+      let timer;
+      await Promise.race([
+        Promise.all(decodes),
+        new Promise(res => { timer = setTimeout(res, budget); })
+      ]);
+      clearTimeout(timer);
+      return counts;
+    }, imageBudget),
+    imageBudget + 5000,
+    "images decode"
+  ).then(counts => {
+    stats.images_decoded = (stats.images_decoded || 0) + counts.decoded;
+    stats.images_failed = (stats.images_failed || 0) + counts.failed;
+    stats.images_pending = (stats.images_pending || 0) + counts.pending;
+    log(`Images: ${counts.decoded} decoded, ${counts.failed} failed, ${counts.pending} still pending`);
+  }).catch(err => {
+    log(`Image decoding timeout (continuing anyway): ${err.message}`);
+  }));
+
+  log("[8/9] MathJax typeset best effort …");
+  await timed(timings, "mathjax", () => withTimeout(
+    page.evaluate(async () => {
+      try {
+        if (window.MathJax && typeof MathJax.typesetPromise === "function") {
+          await MathJax.typesetPromise();
+        }
+      } catch (e) {
+        console.log("MathJax error:", e.message);
+      }
+    }),
+    10000, // Reduced timeout
+    "MathJax typeset"
+  ).catch(err => {
+    log(`MathJax timeout (continuing anyway): ${err.message}`);
+  }));
+
+  log("[9/9] Inject print scale and paginate…");
+  // Fits every tabpanel (or main/section container) onto the page. Scaling
+  // lives in one stylesheet driven by a per-element --q2p-scale variable, and
+  // the pass runs in three phases: unhide panels (writes), measure everything
+  // (reads, one layout for all), then set the variables (writes). Reading
+  // scrollWidth right after styling the previous element instead forced a
+  // synchronous reflow per element, which dominated on documents with
+  // hundreds of panels. The rules are !important so they still beat theme
+  // rules (e.g. `.reveal .slides > section`), as the old inline styles did.
+  // Blocks inside a block that is already scaled are left alone rather than
+  // shrunk twice; every panel still gets its page break.
+  await timed(timings, "layout_scaling", () => page.evaluate(() => {
+    const pxPerMm = 3.78;
+    const targetWpx = Math.floor((420 - 16 - 16) * pxPerMm);
+    const targetHpx = Math.floor((297 - 8 - 8) * pxPerMm);
+
+    const style = document.createElement("style");
+    style.textContent = `
+      @media print {
+        * { box-sizing: border-box !important; }
+        html, body { margin: 0 !important; padding: 10px !important; font-size: 8px !important; line-height: 1.3 !important; }
+        li { font-size: 8px !important; }
+        img { max-width: 100% !important; object-fit: contain !important; page-break-inside: avoid !important; }
+        table { font-size: 8px !important; width: 100% !important; page-break-inside: avoid !important; table-layout: fixed !important; }
+        td, th { padding: 2px 4px !important; font-size: 8px !important; word-wrap: break-word !important; }
+        pre, code { font-size: 7px !important; white-space: pre-wrap !important; word-break: break-word !important; page-break-inside: avoid !important; }
+        .panel-tabset-tabby [role="tabpanel"] { page-break-after: always !important; page-break-inside: avoid !important; margin-bottom: 10px !important; }
+        h1, h2, h3, h4, h5, h6 { page-break-after: avoid !important; margin-top: 10px !important; margin-bottom: 5px !important; }
+      }
+      [role="tabpanel"].q2p-panel { display: block !important; visibility: visible !important; }
+      .q2p-scaled {
+        transform-origin: top left !important;
+        transform: scale(var(--q2p-scale, 1)) !important;
+        width: calc(100% / var(--q2p-scale, 1)) !important;
+        overflow: hidden !important;
+      }
+      .q2p-panel { page-break-after: always !important; margin-bottom: 20px !important; }`;
+    document.head.appendChild(style);
+
+    const fit = (w, h) => Math.max(Math.min(targetWpx / w, targetHpx / h, 1), 0.5);
+
+    const panels = Array.from(document.querySelectorAll('[role="tabpanel"]'));
+    const blocks = panels.length ? panels : Array.from(document.querySelectorAll("main, .content, .container, section"));
+
+    // Writes: unhide every panel at once
+    if (panels.length) panels.forEach(p => p.classList.add("q2p-panel"));
+
+    // Reads: the first forces one layout, the rest are answered from it
+    const sizes = blocks.map(el => {
+      try {
+        return [el.scrollWidth || el.clientWidth || 1, el.scrollHeight || el.clientHeight || 1];
+      } catch (e) {
+        console.log("Error measuring element:", e.message);
+        return null;
+      }
+    });
+
+    // Writes: panels are always scaled and paginated; containers only shrink
+    const scaled = new Set();
+    blocks.forEach((el, i) => {
+      if (!sizes[i]) return;
+      const s = fit(sizes[i][0], sizes[i][1]);
+      if (!panels.length && s >= 1) return;
+      for (let p = el.parentElement; p; p = p.parentElement) {
+        if (scaled.has(p)) return;
+      }
+      el.style.setProperty("--q2p-scale", String(s));
+      el.classList.add("q2p-scaled");
+      scaled.add(el);
+    });
+
+    document.body.style.padding = "10px";
+    document.body.style.margin = "0";
+    document.body.style.boxSizing = "border-box";
+  }));
+
+  await timed(timings, "layout_settle", () => delay(500)); // Reduced delay
+
+  log("[PDF] Creating file…");
+  await timed(timings, "pdf_write", () => withTimeout(
+    page.pdf({
+      path: outAbs,
+      format: "A3",
+      landscape: true,
+      printBackground: true,
+      margin: { top: "8mm", bottom: "8mm", left: "8mm", right: "8mm" },
+      preferCSSPageSize: false,
+      displayHeaderFooter: false,
+      timeout: 60000 // 60s timeout for PDF generation
+    }),
+    60000,
+    "page.pdf"
+  ));
+
+  return timings;
+}
+
+module.exports = {
+  withTimeout, delay, timed, imageBudgetMs, findChromePath, launchBrowser, newContext, assetSettings, interceptAssets, renderToPdf
+};
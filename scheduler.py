@@ -0,0 +1,127 @@
+import os
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from conversion_cache import cache_key
+from asset_cache import hash_document
+from metrics import JobMetrics, get_metrics_registry
+from memory_governor import get_memory_governor
+from prescan import get_throughput_model, scan_html
+
+
+def default_concurrency():
+    value = os.environ.get("QUARTO2PDF_MAX_PARALLEL")
+    if value:
+        return max(1, int(value))
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+class ConversionJob:
+    def __init__(self, name, file_path, output_dir, method=None, estimate=None):
+        self.name = name
+        self.file_path = file_path
+        self.output_dir = output_dir
+        self.method = method  # Overrides the scheduler's method for this job
+        self.estimate = estimate  # prescan.Prescan, filled in before rendering if missing
+
+
+class ConversionResult:
+    def __init__(self, job, pdf_path=None, pages=0, error=None, elapsed=0.0, cached=False, metrics=None):
+        self.job = job
+        self.pdf_path = pdf_path
+        self.pages = pages
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = cached
+        self.metrics = metrics  # JobMetrics.to_dict() of the conversion
+
+    @property
+    def ok(self):
+        return self.error is None and self.pdf_path is not None and os.path.exists(self.pdf_path)
+
+
+# Converts one job with `method`, consulting and filling the cache when one is
+# given, and records the job's metrics. Never raises: failures end up in the
+# result's error. on_progress(pages) is called as pages render; an exception
+# it raises (e.g. to cancel) aborts the conversion.
+def convert_job(job, method, cache=None, on_progress=None):
+    started = time.time()
+    metrics = JobMetrics(method.cache_id, job.name)
+    key = None
+    cached = False
+    try:
+        if cache is not None:
+            with metrics.stage("cache_lookup"):
+                # Local figures and stylesheets count too, not just the HTML
+                key = cache_key(hash_document(job.file_path), method.cache_id, method.render_options())
+                hit = cache.get(key)
+        else:
+            hit = None
+
+        if hit:
+            pdf_path, meta = hit
+            pages, error, cached = meta.get("pages", 0), None, True
+            metrics.count("cache_hits")
+        else:
+            if job.estimate is None:
+                with metrics.stage("prescan"):
+                    job.estimate = scan_html(job.file_path)
+            rendering = time.time()
+            pdf_path, pages = method.process_file(job.file_path, job.output_dir, on_progress, metrics=metrics)
+            error = None if pdf_path else "Conversion produced no PDF"
+            if pdf_path:
+                # Teaches the ETA model how long this many frames take
+                get_throughput_model().observe(method.cache_id, job.estimate.frames, time.time() - rendering)
+
+            if key is not None and pdf_path:
+                with metrics.stage("cache_store"):
+                    pdf_path = cache.put(key, pdf_path, {"pages": pages, "name": job.name})
+    except Exception as e:
+        pdf_path, pages = None, 0
+        error = str(e) or e.__class__.__name__
+
+    metrics.finish("error" if error else "cached" if cached else "ok")
+    get_metrics_registry().record(metrics)
+    return ConversionResult(job, pdf_path, pages, error, time.time() - started,
+                            cached=cached, metrics=metrics.to_dict())
+
+
+# Runs conversions on a bounded set of worker threads. The heavy lifting
+# happens in browser processes (pooled Selenium drivers or the Puppeteer
+# worker), so threads are enough to keep several cores busy.
+#
+# run() is a generator meant for the calling (e.g. Streamlit script) thread:
+# it yields ("progress", job, pages) while files render and
+# ("done", result) as each file finishes, in completion order. An exception
+# in one job only fails that job's result. With a cache, files already
+# converted with the same method and options are served without rendering.
+class ConversionScheduler:
+    def __init__(self, method, max_workers=None, cache=None):
+        self.method = method
+        self.max_workers = max_workers or default_concurrency()
+        self.cache = cache
+
+    def _convert(self, job, events):
+        # Workers beyond what memory allows wait here (see memory_governor.py)
+        with get_memory_governor().slot():
+            result = convert_job(job, job.method or self.method, self.cache,
+                                 lambda pages: events.put(("progress", job, pages)))
+        events.put(("done", result))
+
+    def run(self, jobs):
+        jobs = list(jobs)
+        if not jobs:
+            return
+
+        events = queue.Queue()
+        remaining = len(jobs)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs)),
+                                thread_name_prefix="quarto2pdf") as executor:
+            for job in jobs:
+                executor.submit(self._convert, job, events)
+
+            while remaining:
+                event = events.get()
+                if event[0] == "done":
+                    remaining -= 1
+                yield event
@@ -0,0 +1,118 @@
+import os
+import threading
+import collections
+
+
+# Support for rendering one deck with several browsers at once. Slides are
+# handed out one at a time from a shared queue, so fast and slow browsers
+# balance themselves, and frames are put back into slide order before they
+# reach the PdfAssembler. Only slides that finished out of order are held in
+# memory, and the queue never hands out a slide more than `window` places
+# ahead of the oldest unfinished one, so a slow slide stalls the other
+# browsers instead of letting frames pile up behind it.
+
+
+def shard_settings():
+    return (
+        max(1, int(os.environ.get("QUARTO2PDF_SHARDS", "1"))),
+        int(os.environ.get("QUARTO2PDF_SHARD_MIN_SLIDES", "20")),
+    )
+
+
+# Number of browsers worth using for a deck of `slides` slides
+def plan_shards(slides, shards, min_slides):
+    if shards <= 1 or slides < 2 * max(1, min_slides):
+        return 1
+    return min(shards, slides // max(1, min_slides))
+
+
+# Slide numbers still to render. next() blocks while other workers hold
+# slides that might be handed back (a failed browser retries nothing itself),
+# or while the next slide is `window` or more places ahead of the oldest
+# unfinished one, and returns None once everything is rendered or the job is
+# cancelled.
+class SlideQueue:
+    def __init__(self, count, window=None):
+        self._pending = collections.deque(range(count))
+        self._in_flight = set()
+        self._done = set()
+        self._oldest = 0  # Lowest slide number not done yet
+        self._window = window
+        self._cancelled = False
+        self._cond = threading.Condition()
+
+    def _ahead(self):
+        return self._window is not None and self._pending[0] >= self._oldest + self._window
+
+    def next(self):
+        with self._cond:
+            while (self._in_flight and not self._cancelled
+                   and (not self._pending or self._ahead())):
+                self._cond.wait()
+            if self._cancelled or not self._pending:
+                return None
+            number = self._pending.popleft()
+            self._in_flight.add(number)
+            return number
+
+    def done(self, number):
+        with self._cond:
+            self._in_flight.discard(number)
+            self._done.add(number)
+            while self._oldest in self._done:
+                self._done.discard(self._oldest)
+                self._oldest += 1
+            self._cond.notify_all()
+
+    def retry(self, number):
+        with self._cond:
+            self._in_flight.discard(number)
+            self._pending.appendleft(number)
+            self._cond.notify_all()
+
+    def cancel(self):
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+
+class _SlideFrames:
+    def __init__(self):
+        self.frames = []
+
+    def submit(self, name, data, slide=None):
+        self.frames.append((name, data, slide))
+
+
+# Reorders frames from several browsers into slide order. Each worker
+# captures a slide into slide(number), then calls finish(number) (or
+# discard(number) if it failed part way); frames go to `sink` as soon as
+# every earlier slide has finished.
+class FrameSequencer:
+    def __init__(self, sink):
+        self.sink = sink
+        self.completed = 0
+        self._next = 0
+        self._slides = {}
+        self._finished = set()
+        self._lock = threading.Lock()
+
+    def slide(self, number):
+        with self._lock:
+            frames = self._slides[number] = _SlideFrames()
+            return frames
+
+    def discard(self, number):
+        with self._lock:
+            self._slides.pop(number, None)
+
+    def finish(self, number):
+        with self._lock:
+            self._finished.add(number)
+            self.completed += 1
+            while self._next in self._finished:
+                for name, data, slide in self._slides.pop(self._next).frames:
+                    self.sink.submit(name, data, slide)
+                self._finished.discard(self._next)
+                self._next += 1
+            return self.completed
@@ -0,0 +1,145 @@
+// worker.js — long-lived Puppeteer worker
+// Usage: node worker.js
+//
+// Keeps one Chromium instance open and reads jobs from stdin as
+// line-delimited JSON:
+//   {"id": "job-1", "input": "/abs/in.html", "output": "/abs/out.pdf"}
+//   {"id": "job-1", "cancel": true}
+// Every job renders in a fresh browser context. Replies are written to
+// stdout, one JSON object per line:
+//   {"event": "ready"}
+//   {"id": "job-1", "event": "stage", "message": "[3/9] Goto …"}
+//   {"id": "job-1", "status": "ok", "output": "/abs/out.pdf", "ms": 1234,
+//    "timings": {"navigation": 80, "fonts": 12, …}, "counters": {"asset_hits": 3, …}}
+//   {"id": "job-1", "status": "error", "error": "…"}
+// Anything else the page or Puppeteer prints goes to stderr.
+
+const path = require("path");
+const readline = require("readline");
+const { launchBrowser, newContext, renderToPdf, timed } = require("./render");
+
+const maxConcurrent = Math.max(1, parseInt(process.env.QUARTO2PDF_WORKER_CONCURRENCY || "2", 10));
+
+let browserPromise = null;
+const running = new Map(); // id -> { job, context }
+const waiting = [];
+
+const send = msg => process.stdout.write(JSON.stringify(msg) + "\n");
+const logErr = msg => process.stderr.write(msg + "\n");
+
+function getBrowser() {
+  if (!browserPromise) {
+    browserPromise = launchBrowser(logErr).then(browser => {
+      browser.on("disconnected", () => {
+        logErr("Browser disconnected, relaunching on next job");
+        browserPromise = null;
+      });
+      return browser;
+    });
+    browserPromise.catch(() => { browserPromise = null; });
+  }
+  return browserPromise;
+}
+
+async function runJob(job) {
+  const started = Date.now();
+  const log = message => send({ id: job.id, event: "stage", message });
+  const timings = {};
+  const counters = {};
+  let context = null;
+
+  try {
+    log("[1/9] Launching Chromium…");
+    const browser = await timed(timings, "browser_launch", () => getBrowser());
+    if (job.cancelled) throw new Error("cancelled");
+    context = await timed(timings, "browser_context", () => newContext(browser));
+    running.get(job.id).context = context;
+
+    const page = await context.newPage();
+    page.on("console", m => logErr(`[${job.id}] ${m.text()}`));
+    await renderToPdf(page, path.resolve(job.input), path.resolve(job.output), log, timings, counters);
+
+    send({
+      id: job.id, status: "ok", output: path.resolve(job.output), ms: Date.now() - started, timings, counters
+    });
+  } catch (e) {
+    send({
+      id: job.id,
+      status: "error",
+      error: job.cancelled ? "cancelled" : e.message,
+      ms: Date.now() - started,
+      timings,
+      counters
+    });
+  } finally {
+    running.delete(job.id);
+    if (context) {
+      try { await context.close(); } catch {}
+    }
+    pump();
+  }
+}
+
+function pump() {
+  while (running.size < maxConcurrent && waiting.length) {
+    const job = waiting.shift();
+    running.set(job.id, { job, context: null });
+    runJob(job);
+  }
+}
+
+function cancel(id) {
+  const idx = waiting.findIndex(j => j.id === id);
+  if (idx >= 0) {
+    waiting.splice(idx, 1);
+    send({ id, status: "error", error: "cancelled", ms: 0 });
+    return;
+  }
+  const entry = running.get(id);
+  if (entry) {
+    entry.job.cancelled = true;
+    if (entry.context) entry.context.close().catch(() => {});
+  }
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+
+rl.on("line", line => {
+  line = line.trim();
+  if (!line) return;
+
+  let job;
+  try {
+    job = JSON.parse(line);
+  } catch (e) {
+    send({ status: "error", error: `Invalid job line: ${e.message}` });
+    return;
+  }
+
+  if (job.cancel) {
+    cancel(job.id);
+    return;
+  }
+  if (!job.id || !job.input || !job.output) {
+    send({ id: job.id, status: "error", error: "Job needs id, input and output" });
+    return;
+  }
+  waiting.push(job);
+  pump();
+});
+
+rl.on("close", async () => {
+  // Parent went away: finish in-flight jobs, then shut the browser down
+  while (running.size || waiting.length) {
+    await new Promise(r => setTimeout(r, 100));
+  }
+  if (browserPromise) {
+    try { (await browserPromise).close(); } catch {}
+  }
+  process.exit(0);
+});
+
+// Warm the browser up front so the first job only pays for rendering
+getBrowser()
+  .then(() => send({ event: "ready" }))
+  .catch(e => send({ event: "ready", error: e.message }));
@@ -0,0 +1,175 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+from procstats import pid_alive, process_start_time
+
+
+# Scratch space for conversions (uploads, debug screenshots, bot.js copies,
+# PDFs before they go to the cache). Every conversion gets its own directory
+# under <root>/jobs, so nothing from an earlier run of the same file name can
+# leak into a new one, and the directory tree stays bounded:
+#
+#   - a directory is "active" while its conversion runs (an .active marker
+#     holding the owner's pid and start time) and is never touched then;
+#     markers left by a process that died count as finished, unless a
+#     registered protector (the job queue, for jobs still queued) claims it
+#   - finished directories older than the TTL are deleted
+#   - past the size cap, finished directories are deleted least recently
+#     used first (mtime, refreshed by touch() on downloads)
+#
+# A background thread enforces both every `interval` seconds; enforce() can
+# also be called directly. The PDF and slide caches have their own caps.
+
+ACTIVE_MARKER = ".active"
+
+_workspace = None
+_workspace_lock = threading.Lock()
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class Workspace:
+    def __init__(self, root, max_bytes=2048 * 1024 * 1024, ttl_seconds=24 * 3600, interval=300):
+        self.root = root
+        self.jobs_root = os.path.join(root, "jobs")
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._protectors = []
+
+    # New, empty, active directory for one conversion
+    def job_dir(self, name="job"):
+        os.makedirs(self.jobs_root, exist_ok=True)
+        path = tempfile.mkdtemp(prefix=f"{name}-", dir=self.jobs_root)
+        self.activate(path)
+        return path
+
+    def activate(self, path):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ACTIVE_MARKER), "w") as f:
+            f.write(f"{os.getpid()} {process_start_time(os.getpid()) or 0}")
+
+    # The conversion is over; its files may now expire or be evicted
+    def finish(self, path):
+        try:
+            os.remove(os.path.join(path, ACTIVE_MARKER))
+        except OSError:
+            pass
+        self.touch(path)
+
+    def touch(self, path):
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def remove(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def is_active(self, path):
+        try:
+            with open(os.path.join(path, ACTIVE_MARKER), "r") as f:
+                pid, started = (int(v) for v in f.read().split())
+        except (OSError, ValueError):
+            return False
+        if started:
+            return process_start_time(pid) == started
+        return pid_alive(pid)  # No /proc: pid only
+
+    # `protector()` returns paths that must be kept even without a live marker
+    def add_protector(self, protector):
+        self._protectors.append(protector)
+
+    def _protected(self):
+        paths = set()
+        for protector in self._protectors:
+            try:
+                paths.update(os.path.abspath(p) for p in protector())
+            except Exception:
+                pass
+        return paths
+
+    # (last used, size, path, active) for every job directory
+    def entries(self):
+        try:
+            names = os.listdir(self.jobs_root)
+        except OSError:
+            return []
+        protected = self._protected()
+        entries = []
+        for name in names:
+            path = os.path.join(self.jobs_root, name)
+            try:
+                used = os.path.getmtime(path)
+            except OSError:
+                continue
+            if os.path.isdir(path):
+                active = os.path.abspath(path) in protected or self.is_active(path)
+                entries.append((used, _tree_size(path), path, active))
+        return entries
+
+    def usage(self):
+        return sum(size for _, size, _, _ in self.entries())
+
+    # Applies the TTL and the size cap; returns the directories removed
+    def enforce(self, now=None):
+        with self._lock:
+            cutoff = (now or time.time()) - self.ttl_seconds
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _, _ in entries)
+            removed = []
+            for used, size, path, active in entries:
+                if active:
+                    continue
+                if used < cutoff or total > self.max_bytes:
+                    self.remove(path)
+                    removed.append(path)
+                    total -= size
+            return removed
+
+    def _janitor(self):
+        while True:
+            try:
+                self.enforce()
+            except Exception:
+                pass
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._janitor, name="workspace-janitor", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+# Process-wide workspace with its janitor running
+def get_workspace():
+    global _workspace
+    with _workspace_lock:
+        if _workspace is None:
+            _workspace = Workspace(
+                os.environ.get("QUARTO2PDF_WORK_DIR", "output"),
+                max_bytes=int(os.environ.get("QUARTO2PDF_WORK_MAX_MB", "2048")) * 1024 * 1024,
+                ttl_seconds=float(os.environ.get("QUARTO2PDF_WORK_TTL_HOURS", "24")) * 3600,
+            ).start()
+        return _workspace